@@ -1,12 +1,50 @@
+import calendar
+import csv
+import io
+
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+from django.core.signals import setting_changed
+from django.db.models import Count, Max, prefetch_related_objects
+from django.dispatch import receiver
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
 
-from rest_framework import viewsets
+from rest_framework import exceptions, serializers, viewsets
+from rest_framework.generics import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
+from drf_core.authentication import CachedTokenAuthentication
+from drf_core.cache import (
+    get_model_versions,
+    get_response_cache,
+    is_model_tracked,
+    make_cache_key,
+    make_digest,
+    normalize_params,
+    track_model_versions,
+)
+from drf_core.filtering import OrderingFilter
+from drf_core.instrumentation import InstrumentationMixin
 from drf_core.pagination import BasePagination
+from drf_core.renderers import CoreJSONRenderer
+from drf_core.serializers import (
+    BulkListSerializer,
+    get_compiled_serializer,
+    has_object_permissions,
+)
+from drf_core.queries import (
+    EMPTY_QUERY_PLAN,
+    QueryCounter,
+    QueryPlan,
+    apply_query_plan,
+    get_query_plan,
+    get_query_plan_models,
+)
 from rest_framework.response import Response
 from rest_framework import status
 
@@ -22,16 +60,735 @@ class PaginationViewSet(viewsets.ModelViewSet):
 
 
 class FilteringViewSet(viewsets.ModelViewSet):
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     ordering_fields = '__all__'
 
+    # What to do with orderings that no index supports: `allow`, `downgrade`
+    # or `reject`. Defaults to the `ORDERING_POLICY` setting, then `allow`.
+    ordering_policy = None
+
+
+class QueryPlanViewSet(viewsets.ModelViewSet):
+    """
+    Applies the `select_related` & `prefetch_related` needed by the
+    serializer, so that related objects are not loaded row by row. The plan
+    is built from the serializer fields and cached per serializer class.
+    """
+
+    # Set to a tuple of lookups to override the computed plan.
+    select_related_fields = None
+    prefetch_related_fields = None
+
+    # Adds the `X-Query-Count` header to responses. Defaults to the
+    # `QUERY_COUNT_HEADER` setting, then to `DEBUG`.
+    query_count_header = None
+
+    def get_query_plan(self):
+        if (self.select_related_fields is not None
+                and self.prefetch_related_fields is not None):
+            plan = EMPTY_QUERY_PLAN
+        else:
+            plan = get_query_plan(self.get_serializer_class())
+
+        return QueryPlan(
+            plan.select_related if self.select_related_fields is None
+            else tuple(self.select_related_fields),
+            plan.prefetch_related if self.prefetch_related_fields is None
+            else tuple(self.prefetch_related_fields),
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return apply_query_plan(queryset, self.get_query_plan())
+
+    def dispatch(self, request, *args, **kwargs):
+        enabled = self.query_count_header
+        if enabled is None:
+            enabled = getattr(settings, 'QUERY_COUNT_HEADER', settings.DEBUG)
+
+        if not enabled:
+            return super().dispatch(request, *args, **kwargs)
+
+        with QueryCounter() as counter:
+            response = super().dispatch(request, *args, **kwargs)
+
+        response['X-Query-Count'] = counter.count
+        return response
+
+
+class ConditionalGetViewSet(viewsets.ModelViewSet):
+    """
+    Answers `If-None-Match` & `If-Modified-Since` with `304 Not Modified`
+    before anything is serialized, and sends the `ETag` & `Last-Modified`
+    headers otherwise.
+
+    The validators are computed from the `modified` timestamp: the one of
+    the instance on retrieve, `MAX(modified)` & the count of the filtered
+    queryset on list. The count catches deleted & archived rows.
+    """
+
+    # Enables the conditional requests. Defaults to the `CONDITIONAL_GET`
+    # setting, then to False.
+    conditional_get = None
+    last_modified_field = 'modified'
+
+    def is_conditional_get_enabled(self):
+        enabled = self.conditional_get
+        if enabled is None:
+            enabled = getattr(settings, 'CONDITIONAL_GET', False)
+
+        if not enabled or self.request.method not in ('GET', 'HEAD'):
+            return False
+
+        try:
+            self.get_queryset().model._meta.get_field(self.last_modified_field)
+        except FieldDoesNotExist:
+            return False
+
+        return True
+
+    def get_etag(self, *parts):
+        """
+        Builds a weak ETag from the given parts, the serializer and the
+        negotiated media type, which all change the representation.
+        """
+        serializer_class = self.get_serializer_class()
+        renderer = getattr(self.request, 'accepted_media_type', '')
+        digest = make_digest(
+            serializer_class.__module__,
+            serializer_class.__qualname__,
+            renderer,
+            *parts
+        )
+
+        return 'W/' + quote_etag(digest)
+
+    def get_model_version(self, model):
+        """
+        Returns the version of the model when it is tracked, so that bulk
+        updates not touching `modified` still change the ETag.
+        """
+        if not is_model_tracked(model):
+            return 0
+
+        return get_model_versions([model])[model._meta.label]
+
+    def get_conditional_response(self, etag, last_modified):
+        """
+        Returns the `304 Not Modified` (or `412 Precondition Failed`)
+        response, or None when the full response must be sent.
+        """
+        timestamp = None
+        if last_modified is not None:
+            timestamp = calendar.timegm(last_modified.utctimetuple())
+
+        response = get_conditional_response(
+            self.request._request, etag=etag, last_modified=timestamp
+        )
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+
+        return response
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(
+                calendar.timegm(last_modified.utctimetuple())
+            )
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_conditional_get_enabled():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        aggregates = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field),
+            count=Count('pk'),
+        )
+        last_modified = aggregates['last_modified']
+
+        # The parameters select the page & the ordering of the list.
+        params = normalize_params(request.query_params)
+        etag = self.get_etag(
+            model._meta.label,
+            last_modified.isoformat() if last_modified else '',
+            aggregates['count'],
+            self.get_model_version(model),
+            params,
+        )
+
+        response = self.get_conditional_response(etag, last_modified)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.is_conditional_get_enabled():
+            return super().retrieve(request, *args, **kwargs)
+
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field)
+        etag = self.get_etag(
+            instance._meta.label,
+            instance.pk,
+            last_modified.isoformat() if last_modified else '',
+            self.get_model_version(type(instance)),
+        )
+
+        response = self.get_conditional_response(etag, last_modified)
+        if response is not None:
+            return response
+
+        # Reused by `get_object` instead of being fetched again.
+        self._conditional_object = instance
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def get_object(self):
+        instance = self.__dict__.pop('_conditional_object', None)
+        if instance is None:
+            return super().get_object()
+
+        return instance
+
+
+class ResponseCacheViewSet(viewsets.ModelViewSet):
+    """
+    Caches the rendered bytes of list & retrieve responses, see
+    `drf_core.cache.get_response_cache`.
+
+    Responses are cached per user, host, scheme, path & query parameters,
+    under the versions of the models they read: saving, archiving or bulk
+    updating any of those models makes the cached responses unreachable.
+    While a response is computed, the other requests for it wait instead of
+    computing it too.
+
+    The responses are cached per process, but the model versions are read
+    from the `MODEL_VERSION_CACHE` cache, 'default' by default: it must be
+    shared by every worker, e.g. Redis or Memcached, for a change made by one
+    worker to invalidate the responses of the others. A process-local cache,
+    e.g. `LocMemCache`, only fits single-process deployments.
+    """
+
+    # Enables the cache. Defaults to the `RESPONSE_CACHE` setting, then to
+    # False.
+    cache_responses = None
+    response_cache_timeout = 60
+    # Only these renderer formats are cached, the browsable API is not.
+    response_cache_formats = ('json',)
+    # The seconds a request waits for the same response to be computed,
+    # before computing it without the cache.
+    response_cache_lock_timeout = 10
+    response_cache_key_prefix = 'drf_core:response'
+
+    def is_response_cache_enabled(self):
+        enabled = self.cache_responses
+        if enabled is None:
+            enabled = getattr(settings, 'RESPONSE_CACHE', False)
+
+        if not enabled or self.request.method != 'GET':
+            return False
+
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return renderer is not None and renderer.format in self.response_cache_formats
+
+    def get_response_cache_scope(self):
+        """
+        Returns what the response depends on besides the request, by default
+        the user. Override to share responses, e.g. per group.
+        """
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return 'anonymous'
+
+        return 'user:{}'.format(user.pk)
+
+    def get_response_cache_models(self):
+        model = self.get_queryset().model
+        if not hasattr(self, 'get_query_plan'):
+            return [model]
+
+        return get_query_plan_models(model, self.get_query_plan())
+
+    def get_response_cache_key(self):
+        models = self.get_response_cache_models()
+        for model in models:
+            track_model_versions(model)
+
+        return make_cache_key(
+            '{}:{}'.format(self.response_cache_key_prefix, models[0]._meta.label),
+            self.get_response_cache_scope(),
+            self.request.scheme,
+            self.request.get_host(),
+            self.request.path,
+            self.request.accepted_media_type,
+            normalize_params(self.request.query_params),
+            sorted(get_model_versions(models).items()),
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_response_cache_enabled():
+            return handler(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = self.get_response_cache_key()
+
+        cached = cache.get(key)
+        if cached is None:
+            if not cache.acquire(key, timeout=self.response_cache_lock_timeout):
+                return handler(request, *args, **kwargs)
+
+            # Computed by another request while waiting for the lock.
+            cached = cache.get(key)
+            if cached is None:
+                # The response is stored & the key released once rendered,
+                # see `finalize_response`.
+                self._response_cache_pending = (cache, key)
+                try:
+                    return handler(request, *args, **kwargs)
+                except BaseException:
+                    # `finalize_response` is skipped by unhandled exceptions.
+                    self.__dict__.pop('_response_cache_pending', None)
+                    cache.release(key)
+                    raise
+
+            cache.release(key)
+
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        pending = self.__dict__.pop('_response_cache_pending', None)
+        if pending is None:
+            return response
+
+        cache, key = pending
+        try:
+            if isinstance(response, Response) and response.status_code == 200:
+                response.render()
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    timeout=self.response_cache_timeout,
+                    size=len(response.content),
+                )
+        finally:
+            cache.release(key)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class StreamingListViewSet(viewsets.ModelViewSet):
+    """
+    Streams the whole filtered list, without pagination, when the `_stream`
+    query parameter is given:
+
+        GET /api/v1/books/?_stream=json
+        GET /api/v1/books/?_stream=ndjson
+        GET /api/v1/books/?_stream=csv
+
+    The rows are fetched with `.iterator()` & serialized chunk by chunk, so
+    that the memory stays flat whatever the number of rows. `limit` &
+    `offset` still slice the list when given. The parameter is ignored when
+    the streaming is disabled.
+    """
+
+    # Enables the streaming. Defaults to the `STREAMING_LIST` setting, then
+    # to False.
+    streaming_list = None
+    # Prefixed, so that it does not collide with a filter.
+    stream_query_param = '_stream'
+    stream_formats = ('json', 'ndjson', 'csv')
+    stream_chunk_size = 500
+
+    stream_content_types = {
+        'json': 'application/json',
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def get_stream_format(self):
+        enabled = self.streaming_list
+        if enabled is None:
+            enabled = getattr(settings, 'STREAMING_LIST', False)
+
+        stream_format = self.request.query_params.get(self.stream_query_param)
+        if not enabled or not stream_format:
+            return None
+
+        if stream_format not in self.stream_formats:
+            raise exceptions.ValidationError({
+                self.stream_query_param: [
+                    'Streaming as {} is not supported.'.format(stream_format)
+                ]
+            })
+
+        return stream_format
+
+    def list(self, request, *args, **kwargs):
+        stream_format = self.get_stream_format()
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.slice_stream_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        chunks = self.iter_stream_chunks(queryset)
+        content = getattr(self, 'stream_{}'.format(stream_format))(chunks)
+
+        return StreamingHttpResponse(
+            content, content_type=self.stream_content_types[stream_format]
+        )
+
+    def slice_stream_queryset(self, queryset):
+        params = self.request.query_params
+        try:
+            offset = max(int(params.get('offset', 0)), 0)
+            limit = int(params['limit']) if 'limit' in params else None
+        except ValueError:
+            raise exceptions.ValidationError(
+                {'limit': ['`limit` & `offset` must be integers.']}
+            )
+
+        if limit is not None:
+            return queryset[offset:offset + max(limit, 0)]
+        if offset:
+            return queryset[offset:]
+
+        return queryset
+
+    def iter_stream_chunks(self, queryset):
+        """
+        Yields the serialized rows by chunks of `stream_chunk_size`. The
+        prefetches are run per chunk, `.iterator()` skips them.
+        """
+        prefetch_lookups = queryset._prefetch_related_lookups
+        if prefetch_lookups:
+            queryset = queryset.prefetch_related(None)
+
+        chunk = []
+        for instance in queryset.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(instance)
+            if len(chunk) >= self.stream_chunk_size:
+                yield self.serialize_stream_chunk(chunk, prefetch_lookups)
+                chunk = []
+
+        if chunk:
+            yield self.serialize_stream_chunk(chunk, prefetch_lookups)
+
+    def serialize_stream_chunk(self, chunk, prefetch_lookups):
+        if prefetch_lookups:
+            prefetch_related_objects(chunk, *prefetch_lookups)
+
+        return self.get_serializer(chunk, many=True).data
+
+    def stream_json(self, chunks):
+        renderer = CoreJSONRenderer()
+        yield b'['
+
+        separator = b''
+        for rows in chunks:
+            # Renders the rows as an array, and strips its brackets.
+            yield separator + renderer.render(rows)[1:-1]
+            separator = b','
+
+        yield b']'
+
+    def stream_ndjson(self, chunks):
+        renderer = CoreJSONRenderer()
+        for rows in chunks:
+            yield b''.join(renderer.render(row) + b'\n' for row in rows)
+
+    def stream_csv(self, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # The columns come from the serializer, the rows may miss some.
+        header = _get_csv_header(self.get_serializer())
+        writer.writerow(header)
+
+        for rows in chunks:
+            for row in rows:
+                row = _flatten_row(row)
+                writer.writerow([row.get(name, '') for name in header])
+
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def _get_csv_header(serializer, prefix=''):
+    """
+    Returns the columns of the serializer, with nested serializers expanded
+    into `parent.child` columns as in `_flatten_row`.
+    """
+    header = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        name = prefix + name
+        if isinstance(field, serializers.Serializer):
+            header.extend(_get_csv_header(field, name + '.'))
+        else:
+            header.append(name)
+
+    return header
+
+
+def _flatten_row(row, prefix=''):
+    """
+    Flattens nested objects into `parent.child` columns, and encodes lists
+    as JSON.
+    """
+    flat = {}
+    for name, value in row.items():
+        name = prefix + name
+        if isinstance(value, dict):
+            flat.update(_flatten_row(value, name + '.'))
+        elif isinstance(value, list):
+            flat[name] = CoreJSONRenderer().render(value).decode('utf-8')
+        elif value is None:
+            flat[name] = ''
+        else:
+            flat[name] = value
+
+    return flat
+
+
+class FastSerializerViewSet(viewsets.ModelViewSet):
+    """
+    Serializes list & retrieve responses from a `.values()` projection
+    compiled from the serializer, without building model instances, see
+    `drf_core.serializers`.
+
+    Serializers using fields that need instances, e.g. method fields or
+    to-many relations, are not compiled and take the normal path. Check the
+    output with `BaseAssertion.assertFastSerializerEquivalent`.
+    """
+
+    fast_serializer = False
+
+    def get_compiled_serializer(self):
+        if not self.fast_serializer:
+            return None
+
+        return get_compiled_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = compiled.get_queryset(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+
+        return Response(compiled.serialize(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None or has_object_permissions(self):
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = compiled.get_queryset(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+        return Response(compiled.to_representation(row))
+
+
+class ContributorViewSet(viewsets.ModelViewSet):
+    """
+    Saves the request user as `created_by` & `last_modified_by` of
+    contributor models, in the INSERT or UPDATE of the object itself.
+    """
+
+    def get_contributor_values(self, created=False):
+        """
+        Returns the contributor ids to pass to `serializer.save()`, empty for
+        models without contributors.
+        """
+        model = self.get_queryset().model
+        get_contributor_values = getattr(model, 'get_contributor_values', None)
+        if get_contributor_values is None:
+            return {}
+
+        return get_contributor_values(self.request.user, created=created)
+
+    def perform_create(self, serializer):
+        serializer.save(**self.get_contributor_values(created=True))
+
+    def perform_update(self, serializer):
+        serializer.save(**self.get_contributor_values())
+
+
+class BulkViewSet(ContributorViewSet):
+    """
+    Creates & updates lists of objects in a single request & transaction,
+    with `bulk_create` & `bulk_update`, see `BulkListSerializer`.
+
+    For example:
+        POST /api/v1/books/
+        [{"title": "A"}, {"title": "B"}]
+
+        PUT|PATCH /api/v1/books/bulk/
+        [{"id": 1, "title": "A"}, {"id": 2, "title": "B"}]
+
+    When an item is invalid nothing is written, and the errors are reported
+    with the index of their item. Contributors are stamped as by
+    `ContributorViewSet`.
+    """
+    bulk_max_items = 1000
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        list_serializer_class = getattr(
+            getattr(serializer_class, 'Meta', None), 'list_serializer_class', None
+        )
+        if (list_serializer_class is None
+                or not issubclass(list_serializer_class, BulkListSerializer)):
+            list_serializer_class = BulkListSerializer
+
+        child = serializer_class(context=context, partial=kwargs.get('partial', False))
+        return list_serializer_class(*args, child=child, context=context, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        response = self.check_bulk_data(request.data)
+        if response is not None:
+            return response
+
+        serializer = self.get_bulk_serializer(data=request.data)
+        if not serializer.is_valid():
+            return self.bulk_bad_request(serializer.errors)
+
+        with transaction.atomic():
+            serializer.save(**self.get_contributor_values(created=True))
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['put', 'patch'], url_path='bulk')
+    def bulk_update(self, request, *args, **kwargs):
+        data = request.data
+        response = self.check_bulk_data(data)
+        if response is not None:
+            return response
+
+        ids = [item.get('id') if isinstance(item, dict) else None for item in data]
+        try:
+            instances = self.filter_queryset(self.get_queryset()).in_bulk(
+                [pk for pk in ids if pk is not None]
+            )
+        except (TypeError, ValueError, ValidationError):
+            return self.bad_request(
+                message='`id` contains invalid values.',
+                code='invalid_ids'
+            )
+        instances = {str(pk): instance for pk, instance in instances.items()}
+
+        errors = []
+        seen = set()
+        for pk in ids:
+            if pk is None:
+                errors.append({'id': ['This field is required.']})
+            elif str(pk) not in instances:
+                errors.append({'id': ['Not found.']})
+            elif str(pk) in seen:
+                errors.append({'id': ['Duplicated.']})
+            else:
+                errors.append({})
+            seen.add(str(pk))
+
+        if any(errors):
+            return self.bulk_bad_request(errors)
+
+        instances = [instances[str(pk)] for pk in ids]
+        for instance in instances:
+            self.check_object_permissions(request, instance)
+
+        serializer = self.get_bulk_serializer(
+            instances, data=data, partial=request.method == 'PATCH'
+        )
+        if not serializer.is_valid():
+            return self.bulk_bad_request(serializer.errors)
+
+        with transaction.atomic():
+            serializer.save(**self.get_contributor_values())
+
+        return Response(serializer.data)
+
+    def check_bulk_data(self, data):
+        if not isinstance(data, list) or not data:
+            return self.bad_request(
+                message='Expected a non-empty list of items.',
+                code='invalid_items'
+            )
+
+        if len(data) > self.bulk_max_items:
+            return self.bad_request(
+                message='Expected at most {} items.'.format(self.bulk_max_items),
+                code='too_many_items'
+            )
+
+        return None
+
+    def bulk_bad_request(self, errors):
+        if not isinstance(errors, list):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                'message': 'Some items are invalid.',
+                'code': 'invalid_items',
+                'errors': [
+                    {'index': index, 'errors': item_errors}
+                    for index, item_errors in enumerate(errors)
+                    if item_errors
+                ],
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
 
 class AuthenticationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    authentication_classes = (SessionAuthentication, TokenAuthentication)
+    authentication_classes = (SessionAuthentication, CachedTokenAuthentication)
+
+
+# The resource URIs built by `CommonViewSet.get_resource_uri`.
+_resource_uris = {}
+
 
+@receiver(setting_changed)
+def _clear_resource_uris(setting, **kwargs):
+    if setting == 'DOMAIN':
+        _resource_uris.clear()
 
-class CommonViewSet:
+
+class CommonViewSet(InstrumentationMixin):
     def create_response(self, data=None):
         return Response(data=data, status=status.HTTP_200_OK)
 
@@ -76,14 +833,38 @@ class CommonViewSet:
             status=status.HTTP_204_NO_CONTENT
         )
 
+    api_root = '/api/v1/'
+
     def get_resource_uri(self):
-        domain = settings.DOMAIN
-        api_root = '/api/v1/'
+        """
+        Returns the URI of the resource. It is built once per viewset class &
+        resource name.
+        """
+        key = (type(self), self.resource_name)
+        uri = _resource_uris.get(key)
+        if uri is None:
+            uri = '{}{}{}/'.format(settings.DOMAIN, self.api_root, self.resource_name)
+            _resource_uris[key] = uri
+
+        return uri
 
-        return '{}{}{}/'.format(domain, api_root, self.resource_name)
+    def get_object_uri(self, instance):
+        """
+        Returns the URI of an object of the resource, from the object or its
+        primary key.
+        """
+        return self.get_object_uri_builder()(getattr(instance, 'pk', instance))
+
+    def get_object_uri_builder(self):
+        """
+        Returns a function building the URI of an object from its primary
+        key, for building the URIs of many objects.
+        """
+        uri = self.get_resource_uri()
+        return (uri.replace('{', '{{').replace('}', '}}') + '{}/').format
 
 
-class BaseViewSet(CommonViewSet, PaginationViewSet, FilteringViewSet, AuthenticationViewSet):
+class BaseViewSet(CommonViewSet, StreamingListViewSet, ConditionalGetViewSet, ResponseCacheViewSet, FastSerializerViewSet, BulkViewSet, ContributorViewSet, QueryPlanViewSet, PaginationViewSet, FilteringViewSet, AuthenticationViewSet):
     """
     Base viewset should be used for normal cases.
     """
@@ -91,7 +872,34 @@ class BaseViewSet(CommonViewSet, PaginationViewSet, FilteringViewSet, Authentica
         """
         Override to archive the object only, not remove.
         """
-        instance.archive()
+        instance.archive(user=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='bulk-archive')
+    def bulk_archive(self, request, *args, **kwargs):
+        """
+        Archives the objects whose ids are given in a single UPDATE.
+
+        For example:
+            POST /api/v1/books/bulk-archive/
+            {"ids": [1, 2, 3]}
+        """
+        ids = request.data.get('ids') if hasattr(request.data, 'get') else None
+        if not isinstance(ids, list) or not ids:
+            return self.bad_request(
+                message='`ids` must be a non-empty list.',
+                code='invalid_ids'
+            )
+
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(pk__in=ids)
+        except (TypeError, ValueError, ValidationError):
+            return self.bad_request(
+                message='`ids` contains invalid values.',
+                code='invalid_ids'
+            )
+
+        archived = queryset.archive(user=request.user)
+        return self.create_response({'archived': archived})
 
 
 class BaseEmptyViewSet(CommonViewSet, viewsets.ModelViewSet):
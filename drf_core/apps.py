@@ -29,3 +29,15 @@ class CoreConfig(BaseConfig):
 
         from django.utils.module_loading import autodiscover_modules
         autodiscover_modules('signals')
+
+        # Version the models that cached results depend on, in every process
+        # that may write them.
+        from django.conf import settings
+        from drf_core.cache import track_model_versions
+
+        for label in getattr(settings, 'VERSIONED_MODELS', []):
+            track_model_versions(label)
+
+        # Invalidates the cached tokens on token & user changes, in every
+        # process that may write them.
+        import drf_core.authentication  # noqa
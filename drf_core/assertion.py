@@ -1,3 +1,41 @@
+import json
+import re
+import time
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from rest_framework.renderers import JSONRenderer
+
+from drf_core.queries import QueryCounter
+from drf_core.serializers import get_compiled_serializer
+
+# The plan nodes reading an index, on PostgreSQL.
+POSTGRES_INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+# The plan steps searching an index or the primary key, on SQLite. Steps
+# scanning a whole index are not searches.
+SQLITE_INDEX_RE = re.compile(
+    r'SEARCH (?:TABLE )?\S+ (?:AS \S+ )?USING '
+    r'(?:(?:COVERING )?INDEX (\S+)|(?:INTEGER )?PRIMARY KEY)'
+)
+
+
+def _call_or_enter(context, func, args, kwargs):
+    # Like `assertNumQueries`, the assertions run `func` when it is given,
+    # and are context managers otherwise.
+    if func is None:
+        return context
+
+    with context:
+        return func(*args, **kwargs)
+
+
+def _format_queries(counter):
+    return '\n'.join(
+        '{}x {}'.format(count, sql) for sql, count in counter.signatures.most_common()
+    )
+
+
 class BaseAssertion:
     def assertHttpOK(self, resp):
         """
@@ -100,3 +138,145 @@ class BaseAssertion:
         Ensures the response is returning a HTTP 501.
         """
         return self.assertEqual(resp.status_code, 501)
+
+    def assertFastSerializerEquivalent(self, serializer_class, queryset):
+        """
+        Ensures the fast serializer renders the queryset to the same bytes
+        as the normal serializer.
+        """
+        compiled = get_compiled_serializer(serializer_class)
+        self.assertIsNotNone(
+            compiled, '{} cannot be compiled.'.format(serializer_class.__name__)
+        )
+
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True).data)
+        actual = renderer.render(compiled.serialize(compiled.get_queryset(queryset)))
+
+        return self.assertEqual(actual, expected)
+
+    # --------------------------------------------------------------------------
+    # Performance
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def _checkQueries(self, check, using):
+        with QueryCounter(using) as counter:
+            yield counter
+
+        check(counter)
+
+    def assertMaxQueries(self, num, func=None, *args, using=None, **kwargs):
+        """
+        Ensures at most `num` queries run in `func`, or in the `with` block:
+
+            with self.assertMaxQueries(3):
+                self.get_json_ok()
+
+        Counts every database, unless `using` is given.
+        """
+        def check(counter):
+            self.assertLessEqual(
+                counter.count, num,
+                '{} queries run, {} at most expected:\n{}'.format(
+                    counter.count, num, _format_queries(counter)
+                )
+            )
+
+        return _call_or_enter(self._checkQueries(check, using), func, args, kwargs)
+
+    def assertNumQueriesLessThan(self, num, func=None, *args, using=None, **kwargs):
+        """
+        Ensures less than `num` queries run, see `assertMaxQueries`.
+        """
+        return self.assertMaxQueries(num - 1, func, *args, using=using, **kwargs)
+
+    def assertNoDuplicateQueries(self, func=None, *args, using=None,
+                                 max_duplicates=0, **kwargs):
+        """
+        Ensures the same query, with other parameters, does not run twice,
+        e.g. row by row (N+1). Used as `assertMaxQueries`.
+        """
+        def check(counter):
+            self.assertLessEqual(
+                counter.duplicate_count, max_duplicates,
+                '{} duplicated queries, {} at most expected:\n{}'.format(
+                    counter.duplicate_count, max_duplicates, '\n'.join(
+                        '{}x {}'.format(count, sql) for sql, count in counter.get_duplicates()
+                    )
+                )
+            )
+
+        return _call_or_enter(self._checkQueries(check, using), func, args, kwargs)
+
+    @contextmanager
+    def _checkTime(self, milliseconds):
+        start = time.perf_counter()
+        yield
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.assertLess(elapsed, milliseconds, 'Ran in {:.1f}ms, under {}ms expected.'.format(
+            elapsed, milliseconds
+        ))
+
+    def assertResponseTimeUnder(self, milliseconds, func=None, *args, **kwargs):
+        """
+        Ensures `func`, or the `with` block, runs in less than `milliseconds`.
+        Wall-clock times vary between machines, budgets should be generous.
+        """
+        return _call_or_enter(self._checkTime(milliseconds), func, args, kwargs)
+
+    def assertQueryUsesIndex(self, queryset, index=None):
+        """
+        Ensures the database plans to search an index to read the queryset,
+        the index named `index` if given. Full scans of an index, e.g. to
+        order the rows, do not count. The primary key counts as an index on
+        SQLite.
+
+        Supports SQLite & PostgreSQL, the test is skipped on the other
+        databases. On PostgreSQL, sequential scans are disabled while
+        planning, as the planner prefers them on the small tables of tests.
+        """
+        using = queryset.db
+        vendor = connections[using].vendor
+
+        if vendor == 'sqlite':
+            plan = queryset.explain()
+            indexes = [
+                match.group(1) or 'PRIMARY KEY' for match in SQLITE_INDEX_RE.finditer(plan)
+            ]
+
+        elif vendor == 'postgresql':
+            # `QuerySet.explain` joins the plan decoded by psycopg2 as a
+            # Python repr, the raw cursor keeps it decodable.
+            sql, params = queryset.query.sql_with_params()
+            with transaction.atomic(using=using):
+                with connections[using].cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                    plan = cursor.fetchone()[0]
+
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            indexes = []
+            nodes = [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] in POSTGRES_INDEX_NODES and 'Index Cond' in node:
+                    indexes.append(node['Index Name'])
+                nodes.extend(node.get('Plans', []))
+
+        else:
+            return self.skipTest(
+                'assertQueryUsesIndex does not support {}.'.format(vendor)
+            )
+
+        if not isinstance(plan, str):
+            plan = json.dumps(plan, indent=2)
+
+        if index is None:
+            return self.assertTrue(indexes, 'The query uses no index:\n{}'.format(plan))
+
+        return self.assertIn(index, indexes, 'The query does not use {}:\n{}'.format(
+            index, plan
+        ))
@@ -0,0 +1,167 @@
+""" Provides the authentication classes of drf-core.
+"""
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_init, post_save
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from drf_core.cache import LRUCache
+
+TOKEN_KEY_PREFIX = 'drf_core:token'
+
+# The user fields whose changes revoke the cached tokens.
+USER_CREDENTIAL_FIELDS = ('password', 'is_active')
+
+_token_cache = None
+
+
+def get_token_cache():
+    """
+    Returns the process-local cache of authenticated tokens, bounded by the
+    `AUTH_TOKEN_CACHE_MAX_ENTRIES` setting. Entries expire after the
+    `AUTH_TOKEN_CACHE_TIMEOUT` setting, in seconds.
+    """
+    global _token_cache
+
+    if _token_cache is None:
+        _token_cache = LRUCache(
+            max_entries=getattr(settings, 'AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000),
+            timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60),
+        )
+
+    return _token_cache
+
+
+def get_shared_token_cache():
+    """
+    Returns the cache shared by the processes, set with the
+    `AUTH_TOKEN_SHARED_CACHE` setting, or None.
+    """
+    alias = getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', None)
+    if alias is None:
+        return None
+
+    return caches[alias]
+
+
+def _get_shared_key(key):
+    # Token keys are credentials, they are not written in the cache keys.
+    return '{}:{}'.format(TOKEN_KEY_PREFIX, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def invalidate_tokens(keys):
+    """
+    Removes the tokens from the local & shared caches. The local caches of
+    other processes expire after `AUTH_TOKEN_CACHE_TIMEOUT`.
+    """
+    local_cache = get_token_cache()
+    for key in keys:
+        local_cache.delete(key)
+
+    shared_cache = get_shared_token_cache()
+    if shared_cache is not None and keys:
+        shared_cache.delete_many([_get_shared_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication caching the token → user lookups, first in a
+    process-local LRU cache, then in the optional shared cache.
+
+    Cached tokens are invalidated when they are deleted, and when their user
+    is saved with a change of `password` or `is_active`.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = self.get_cached_credentials(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            self.set_cached_credentials(key, (user, token))
+        else:
+            user, token = cached
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        # Requests must not share the cached instances.
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+
+        return (user, token)
+
+    def get_cached_credentials(self, key):
+        local_cache = get_token_cache()
+        cached = local_cache.get(key)
+        if cached is not None:
+            return cached
+
+        shared_cache = get_shared_token_cache()
+        if shared_cache is None:
+            return None
+
+        cached = shared_cache.get(_get_shared_key(key))
+        if cached is not None:
+            local_cache.set(key, cached)
+
+        return cached
+
+    def set_cached_credentials(self, key, credentials):
+        get_token_cache().set(key, credentials)
+
+        shared_cache = get_shared_token_cache()
+        if shared_cache is not None:
+            shared_cache.set(
+                _get_shared_key(key),
+                credentials,
+                getattr(settings, 'AUTH_TOKEN_SHARED_CACHE_TIMEOUT', 300)
+            )
+
+
+def _on_token_change(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+def _get_user_credentials(instance):
+    # Deferred fields are missing, and compare as changed once loaded.
+    return tuple(instance.__dict__.get(name) for name in USER_CREDENTIAL_FIELDS)
+
+
+def _on_user_init(sender, instance, **kwargs):
+    instance._drf_core_credentials = _get_user_credentials(instance)
+
+
+def _on_user_change(sender, instance, created=False, update_fields=None, **kwargs):
+    credentials = _get_user_credentials(instance)
+    previous = getattr(instance, '_drf_core_credentials', None)
+    instance._drf_core_credentials = credentials
+
+    if created:
+        return
+    if update_fields is not None and not set(USER_CREDENTIAL_FIELDS) & set(update_fields):
+        return
+    if previous == credentials:
+        # e.g. a full save after a `last_login` update.
+        return
+
+    invalidate_tokens(list(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    ))
+
+
+post_save.connect(_on_token_change, sender=Token, dispatch_uid='drf_core_token_save')
+post_delete.connect(_on_token_change, sender=Token, dispatch_uid='drf_core_token_delete')
+post_init.connect(
+    _on_user_init,
+    sender=settings.AUTH_USER_MODEL,
+    dispatch_uid='drf_core_token_user_init'
+)
+post_save.connect(
+    _on_user_change,
+    sender=settings.AUTH_USER_MODEL,
+    dispatch_uid='drf_core_token_user_save'
+)
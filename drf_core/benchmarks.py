@@ -0,0 +1,470 @@
+""" Provides micro-benchmarks of drf-core components, and benchmarks of
+    viewsets against datasets seeded with `Sampling`.
+
+    They need a configured Django project, e.g.:
+
+        from drf_core.benchmarks import benchmark_renderers, print_results
+        print_results(benchmark_renderers())
+
+        from drf_core.benchmarks import run_benchmarks
+        run_benchmarks(
+            BookViewSet,
+            sizes=(10 ** 3, 10 ** 4),
+            filters={'author': {'author__name__icontains': 'a'}},
+            orderings=['-created', 'title'],
+            path='benchmarks-0.0.3.json',
+        )
+"""
+import datetime
+import decimal
+import itertools
+import json
+import math
+import platform
+import time
+import timeit
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import django
+import rest_framework
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.utils import timezone
+from factory.random import reseed_random
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from drf_core import log
+from drf_core.queries import QueryCounter
+from drf_core.renderers import CoreJSONRenderer, get_json_backend
+from drf_core.sampling import Sampling
+from drf_core.utils import get_queryset_by_order, pluralize, pluralize_many
+
+
+def measure(func, number=1000, repeat=5):
+    """
+    Runs `func` `number` times, `repeat` times over, and returns the calls
+    per second of the best & the mean run.
+    """
+    timings = timeit.repeat(func, number=number, repeat=repeat)
+    best = min(timings)
+    mean = sum(timings) / len(timings)
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'best_per_second': number / best if best else float('inf'),
+        'mean_per_second': number / mean if mean else float('inf'),
+    }
+
+
+def print_results(results):
+    for name, result in results.items():
+        print('{:<30} {}'.format(name, ', '.join(
+            '{}={}'.format(key, round(value, 2) if isinstance(value, float) else value)
+            for key, value in result.items()
+        )))
+
+
+# ==============================================================================
+# Renderers
+# ==============================================================================
+def get_sample_payload(rows=100):
+    """
+    Returns a paginated list payload with the values our serializers
+    produce: strings, decimals, datetimes, UUIDs & nested objects.
+    """
+    now = timezone.now()
+    results = [
+        {
+            'id': index,
+            'uuid': uuid.UUID(int=index),
+            'name': 'Item {} – façade'.format(index),
+            'price': '{}.50'.format(index),
+            'amount': decimal.Decimal('{}.25'.format(index)),
+            'percentage': decimal.Decimal('12.50'),
+            'archived': bool(index % 2),
+            'created': now - datetime.timedelta(minutes=index),
+            'modified': now,
+            'created_by': {'id': 1, 'username': 'admin'},
+            'tags': ['a', 'b', 'c'],
+            'description': None,
+        }
+        for index in range(rows)
+    ]
+
+    return {
+        'count': rows,
+        'count_exact': True,
+        'next': None,
+        'previous': None,
+        'results': results,
+    }
+
+
+def benchmark_renderers(payload=None, number=200, repeat=5):
+    """
+    Compares the rendering throughput of the DRF renderer and of
+    `CoreJSONRenderer`, with the JSON backend in use.
+    """
+    if payload is None:
+        payload = get_sample_payload()
+
+    renderers = {
+        'drf.JSONRenderer': JSONRenderer(),
+        'CoreJSONRenderer[{}]'.format(get_json_backend()): CoreJSONRenderer(),
+    }
+
+    outputs = {}
+    results = {}
+    for name, renderer in renderers.items():
+        outputs[name] = renderer.render(payload)
+        result = measure(lambda: renderer.render(payload), number=number, repeat=repeat)
+        result['bytes'] = len(outputs[name])
+        result['mb_per_second'] = result['best_per_second'] * result['bytes'] / 1024 / 1024
+        results[name] = result
+
+    identical = len(set(outputs.values())) == 1
+    for result in results.values():
+        result['identical'] = identical
+
+    return results
+
+
+# ==============================================================================
+# Resource URIs
+# ==============================================================================
+RESOURCE_NAMES = [
+    'book', 'category', 'address', 'person', 'status', 'index', 'company',
+    'box', 'branch', 'radius', 'leaf', 'policy', 'day', 'order', 'invoice',
+]
+
+
+def benchmark_pluralize(words=None, number=2000, repeat=5):
+    """
+    Compares pluralizing the words one by one without & with the memoized
+    `pluralize`, and with `pluralize_many`.
+    """
+    if words is None:
+        words = RESOURCE_NAMES * 10
+
+    uncached = pluralize.__wrapped__
+
+    return {
+        'pluralize[uncached]': measure(
+            lambda: [uncached(word) for word in words], number=number, repeat=repeat
+        ),
+        'pluralize[cached]': measure(
+            lambda: [pluralize(word) for word in words], number=number, repeat=repeat
+        ),
+        'pluralize_many': measure(
+            lambda: pluralize_many(words), number=number, repeat=repeat
+        ),
+    }
+
+
+def benchmark_resource_uri(viewset_class, rows=100, number=2000, repeat=5):
+    """
+    Compares building the URIs of `rows` objects by formatting the whole URI
+    per object, and with the cached prefix of `get_object_uri_builder`.
+    """
+    viewset = viewset_class()
+    pks = list(range(rows))
+
+    def format_per_object():
+        return [
+            '{}{}{}/{}/'.format(settings.DOMAIN, viewset.api_root, viewset.resource_name, pk)
+            for pk in pks
+        ]
+
+    def cached_prefix():
+        build_uri = viewset.get_object_uri_builder()
+        return [build_uri(pk) for pk in pks]
+
+    assert format_per_object() == cached_prefix()
+
+    return {
+        'resource_uri[format]': measure(format_per_object, number=number, repeat=repeat),
+        'resource_uri[cached]': measure(cached_prefix, number=number, repeat=repeat),
+    }
+
+
+# ==============================================================================
+# Viewsets
+# ==============================================================================
+# The sizes of the datasets of `run_benchmarks`, in rows.
+DATASET_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+# The rows generated per transaction while seeding.
+SEED_CHUNK_SIZE = 100000
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of the values.
+    """
+    values = sorted(values)
+    index = max(int(math.ceil(percent / 100 * len(values))) - 1, 0)
+    return values[index]
+
+
+def measure_requests(func, number=100, warmup=5):
+    """
+    Calls `func` `warmup` times, then `number` times, and returns the
+    requests per second, the p50 & p99 latencies in milliseconds, the queries
+    per request and the peak memory of one more call, in KiB.
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    queries = 0
+    for _ in range(number):
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+        queries += counter.count
+
+    # Memory is traced apart, as tracing slows every allocation down.
+    peak_memory = None
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        try:
+            func()
+            peak_memory = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'number': number,
+        'requests_per_second': number / sum(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries_per_request': queries / number,
+        'peak_memory_kb': peak_memory,
+    }
+
+
+def seed_dataset(model, rows, sampling=None, seed=0):
+    """
+    Generates rows of the model with `Sampling` in batch mode, until the
+    table has `rows` rows, so that growing datasets extend the smaller ones.
+    The data only depends on `seed` & on the sizes seeded before.
+    """
+    manager = model._default_manager
+    count = manager.count()
+    if count >= rows:
+        return count
+
+    sampling = sampling or Sampling()
+    factory = sampling._import_factory_by_model(model._meta.app_label, model.__name__)
+
+    while count < rows:
+        size = min(SEED_CHUNK_SIZE, rows - count)
+        reseed_random(seed + count)
+
+        start = time.perf_counter()
+        sampling.generate_batch(factory, size)
+        log.info(
+            'Seeded %s %s rows in %.2fs', size, model._meta.label,
+            time.perf_counter() - start
+        )
+        count = manager.count()
+
+    return count
+
+
+def get_benchmark_user():
+    User = get_user_model()
+    user, _ = User._default_manager.get_or_create(**{
+        User.USERNAME_FIELD: 'benchmark',
+        'defaults': {'is_staff': True, 'is_superuser': True},
+    })
+
+    return user
+
+
+@contextmanager
+def _rolled_back(using):
+    # Writes are rolled back, so that every run sees the same dataset.
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
+
+
+def benchmark_viewset(viewset_class, create_data=None, filters=None, orderings=(),
+                      number=100, warmup=5, user=None):
+    """
+    Measures the requests of a `BaseViewSet` on the current dataset:
+
+        list: the first page of `BasePagination`.
+        list[deep]: the last page.
+        retrieve: objects spread over the table.
+        filter[<name>]: the list filtered with the query params of `filters`,
+            e.g. of related filtersets.
+        ordering[<ordering>]: the list ordered by each of `orderings`.
+        get_queryset_by_order[<ordering>]: the first page of the ordered
+            queryset, without the view.
+        create: posts `create_data(index)`, when given.
+        destroy: archives distinct objects.
+
+    Create & destroy are rolled back, they run inside a transaction.
+    """
+    user = user or get_benchmark_user()
+    factory = APIRequestFactory()
+    path = '/{}/'.format(viewset_class.resource_name)
+    queryset = viewset_class.queryset.all()
+    using = router.db_for_write(queryset.model)
+    limit = viewset_class.pagination_class.default_limit
+    count = queryset.count()
+
+    views = {}
+
+    def call(method, action, path, data=None, **kwargs):
+        view = views.get((method, action))
+        if view is None:
+            view = views[(method, action)] = viewset_class.as_view({method: action})
+
+        request = getattr(factory, method)(path, data, format='json')
+        force_authenticate(request, user)
+        response = view(request, **kwargs)
+        response.render()
+
+        assert response.status_code < 300, '{} {} {}: {}'.format(
+            method.upper(), path, response.status_code, response.content[:200]
+        )
+        return response
+
+    def measure_calls(func):
+        return measure_requests(func, number=number, warmup=warmup)
+
+    results = {}
+    results['list'] = measure_calls(lambda: call('get', 'list', path))
+
+    deep = {'offset': max(count - limit, 0), 'limit': limit}
+    results['list[deep]'] = measure_calls(lambda: call('get', 'list', path, deep))
+
+    ordered = queryset.order_by('pk').values_list('pk', flat=True)
+    pks = itertools.cycle([ordered[index] for index in range(0, count, max(count // 10, 1))])
+    results['retrieve'] = measure_calls(
+        lambda: call('get', 'retrieve', path, pk=next(pks))
+    )
+
+    for name, params in (filters or {}).items():
+        results['filter[{}]'.format(name)] = measure_calls(
+            lambda params=params: call('get', 'list', path, params)
+        )
+
+    for ordering in orderings:
+        results['ordering[{}]'.format(ordering)] = measure_calls(
+            lambda ordering=ordering: call('get', 'list', path, {'ordering': ordering})
+        )
+        results['get_queryset_by_order[{}]'.format(ordering)] = measure_calls(
+            lambda ordering=ordering: list(get_queryset_by_order(queryset, ordering)[:limit])
+        )
+
+    if create_data is not None:
+        indexes = itertools.count()
+        with _rolled_back(using):
+            results['create'] = measure_calls(
+                lambda: call('post', 'create', path, create_data(next(indexes)))
+            )
+
+    calls = warmup + number + 1
+    destroyed = iter(list(ordered.reverse()[:calls]))
+    if count >= calls:
+        with _rolled_back(using):
+            results['destroy'] = measure_calls(
+                lambda: call('delete', 'destroy', path, pk=next(destroyed))
+            )
+
+    return results
+
+
+def get_environment():
+    """
+    Returns the versions & the database the results were measured with.
+    """
+    connection = connections['default']
+    environment = {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'django': django.get_version(),
+        'rest_framework': rest_framework.VERSION,
+        'database': connection.vendor,
+        'json_backend': get_json_backend(),
+    }
+    if connection.vendor == 'sqlite':
+        environment['sqlite'] = connection.Database.sqlite_version
+
+    return environment
+
+
+def run_benchmarks(viewset_class, sizes=DATASET_SIZES, path=None, seed=0, label=None,
+                   **kwargs):
+    """
+    Seeds the model of the viewset to each of the `sizes`, runs
+    `benchmark_viewset` with `kwargs` on each dataset, and saves the results
+    as JSON to `path` when given.
+
+    Seeding is cumulative, a fresh database gives the same datasets.
+    """
+    model = viewset_class.queryset.model
+    sampling = Sampling()
+    results = {
+        'label': label,
+        'viewset': '{}.{}'.format(viewset_class.__module__, viewset_class.__name__),
+        'environment': get_environment(),
+        'datasets': {},
+    }
+
+    for rows in sorted(sizes):
+        seed_dataset(model, rows, sampling=sampling, seed=seed)
+        results['datasets'][str(rows)] = benchmark_viewset(viewset_class, **kwargs)
+
+    if path is not None:
+        save_results(results, path)
+
+    return results
+
+
+def save_results(results, path):
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+
+def compare_results(baseline, results):
+    """
+    Returns, per dataset & benchmark present in both results, the ratio of
+    the requests per second & of the p99 latency to the baseline, and the
+    difference of queries per request. Results may be paths of saved results.
+    """
+    if isinstance(baseline, str):
+        with open(baseline) as source:
+            baseline = json.load(source)
+    if isinstance(results, str):
+        with open(results) as source:
+            results = json.load(source)
+
+    comparison = {}
+    for rows, benchmarks in results['datasets'].items():
+        baseline_benchmarks = baseline['datasets'].get(rows, {})
+        for name, result in benchmarks.items():
+            base = baseline_benchmarks.get(name)
+            if base is None:
+                continue
+
+            comparison['{}:{}'.format(rows, name)] = {
+                'requests_per_second': result['requests_per_second'] / base['requests_per_second'],
+                'p99_ms': result['p99_ms'] / base['p99_ms'],
+                'queries_per_request': (
+                    result['queries_per_request'] - base['queries_per_request']
+                ),
+            }
+
+    return comparison
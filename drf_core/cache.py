@@ -0,0 +1,292 @@
+""" Provides the caching helpers shared by drf-core components.
+
+    Cached results are invalidated through per-model version counters: every
+    change of a tracked model bumps its version, and the versions of the
+    models a result depends on are part of its cache key.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+VERSION_KEY_PREFIX = 'drf_core:version'
+
+# The query parameters that select a page or a format, not the rows.
+NON_FILTER_PARAMS = ('limit', 'offset', 'cursor', 'format')
+
+# The labels of the models whose versions are tracked.
+_tracked_models = set()
+
+
+def get_version_cache():
+    return caches[getattr(settings, 'MODEL_VERSION_CACHE', 'default')]
+
+
+def _get_version_key(model):
+    return '{}:{}'.format(VERSION_KEY_PREFIX, model._meta.concrete_model._meta.label)
+
+
+def get_model_versions(models):
+    """
+    Returns the current version of every model, keyed by model label.
+    """
+    cache = get_version_cache()
+    keys = {_get_version_key(model): model._meta.label for model in models}
+    versions = cache.get_many(list(keys))
+
+    return {
+        label: versions.get(key, 0)
+        for key, label in keys.items()
+    }
+
+
+def bump_model_version(model):
+    """
+    Increments the version of the model, which invalidates every cached
+    result depending on it.
+    """
+    cache = get_version_cache()
+    key = _get_version_key(model)
+
+    # The key never expires, it only has to exist before `incr`.
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between `add` and `incr`.
+        cache.set(key, 1, None)
+
+
+def notify_model_change(model, using=None):
+    """
+    Bumps the version of a tracked model once the current transaction is
+    committed, so that no result computed from uncommitted data is cached
+    under the new version.
+    """
+    if model._meta.concrete_model._meta.label not in _tracked_models:
+        return
+
+    transaction.on_commit(lambda: bump_model_version(model), using=using)
+
+
+def track_model_versions(model):
+    """
+    Starts bumping the version of the model on save & delete. Bulk
+    operations are covered by `drf_core.models.QuerySet`.
+
+    Every process that writes the model must track it, list the model in the
+    `VERSIONED_MODELS` setting to track it when the app is ready.
+    """
+    if isinstance(model, str):
+        model = apps.get_model(model)
+
+    model = model._meta.concrete_model
+    label = model._meta.label
+    if label in _tracked_models:
+        return
+
+    _tracked_models.add(label)
+
+    # Only the tracked models get receivers: a receiver for every model
+    # would disable the fast delete path of Django everywhere.
+    post_save.connect(
+        _on_model_change,
+        sender=model,
+        dispatch_uid='drf_core_version_save_{}'.format(label)
+    )
+    post_delete.connect(
+        _on_model_change,
+        sender=model,
+        dispatch_uid='drf_core_version_delete_{}'.format(label)
+    )
+
+
+def is_model_tracked(model):
+    return model._meta.concrete_model._meta.label in _tracked_models
+
+
+def _on_model_change(sender, instance, using=None, **kwargs):
+    notify_model_change(sender, using=using)
+
+
+# ==============================================================================
+# Cache keys
+# ==============================================================================
+def normalize_params(params, ignored=()):
+    """
+    Returns the query parameters as `(name, values)` pairs sorted by name &
+    value, without the `ignored` ones. `params` is a `QueryDict` or a dict.
+    """
+    if hasattr(params, 'lists'):
+        items = params.lists()
+    else:
+        items = ((name, [value]) for name, value in params.items())
+
+    return sorted(
+        (name, sorted(str(value) for value in values))
+        for name, values in items
+        if name not in ignored
+    )
+
+
+def make_digest(*parts):
+    """
+    Returns the MD5 digest of the JSON of the parts.
+    """
+    raw = json.dumps(parts, default=str)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def make_cache_key(prefix, *parts):
+    return '{}:{}'.format(prefix, make_digest(*parts))
+
+
+# ==============================================================================
+# LRUCache
+# ==============================================================================
+class LRUCache:
+    """
+    A thread-safe, process-local LRU cache bounded by a number of entries and
+    optionally by a total size in bytes. Entries may expire after a timeout.
+
+    Hits, misses & evictions are counted for monitoring, see `stats()`.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, timeout=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # The locks of the keys being computed, with their number of users.
+        self._key_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None, size=None):
+        """
+        Stores the value. The size defaults to the length of `bytes` values,
+        values bigger than `max_bytes` are not stored.
+        """
+        if size is None:
+            size = len(value) if isinstance(value, (bytes, bytearray)) else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        if timeout is None:
+            timeout = self.timeout
+        expires = time.monotonic() + timeout if timeout is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (expires, value, size)
+            self._bytes += size
+
+            while (len(self._entries) > self.max_entries
+                   or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def acquire(self, key, timeout=None):
+        """
+        Locks the key, so that a single thread computes a missing value while
+        the others wait for it. Returns False when the timeout expired.
+        """
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = [threading.Lock(), 0]
+            key_lock[1] += 1
+
+        acquired = key_lock[0].acquire(timeout=-1 if timeout is None else timeout)
+        if not acquired:
+            self._unref_key_lock(key)
+
+        return acquired
+
+    def release(self, key):
+        self._key_locks[key][0].release()
+        self._unref_key_lock(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _unref_key_lock(self, key):
+        with self._lock:
+            key_lock = self._key_locks[key]
+            key_lock[1] -= 1
+            if not key_lock[1]:
+                del self._key_locks[key]
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """
+    Returns the process-local cache of rendered responses, bounded by the
+    `RESPONSE_CACHE_MAX_ENTRIES` & `RESPONSE_CACHE_MAX_BYTES` settings.
+    """
+    global _response_cache
+
+    if _response_cache is None:
+        _response_cache = LRUCache(
+            max_entries=getattr(settings, 'RESPONSE_CACHE_MAX_ENTRIES', 1000),
+            max_bytes=getattr(settings, 'RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        )
+
+    return _response_cache
@@ -0,0 +1,172 @@
+""" Provides the counting strategies used by `BasePagination`. A strategy
+    returns a `(count, is_exact)` pair, so that the response can tell clients
+    whether they should show "N results" or "about N results".
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from drf_core.cache import NON_FILTER_PARAMS, make_cache_key, normalize_params
+
+
+# ==============================================================================
+# BaseCount
+# ==============================================================================
+class BaseCount:
+    """
+    Base class for counting strategies.
+    """
+
+    def count(self, queryset, request=None):
+        """
+        Returns the `(count, is_exact)` pair of the queryset.
+        """
+        raise NotImplementedError('`count()` must be implemented.')
+
+
+class ExactCount(BaseCount):
+    """
+    Runs a plain `COUNT(*)`. This is the default strategy.
+    """
+
+    def count(self, queryset, request=None):
+        return queryset.count(), True
+
+
+class EstimatedCount(BaseCount):
+    """
+    Asks the PostgreSQL planner instead of counting. Unfiltered querysets
+    read `pg_class.reltuples`, filtered ones read the row estimate of
+    `EXPLAIN`. Other databases fall back to an exact count.
+    """
+
+    def count(self, queryset, request=None):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count(), True
+
+        query = queryset.query
+        if not query.where.children and not query.distinct and not query.combinator:
+            estimate = self._table_estimate(queryset, connection)
+        else:
+            estimate = self._explain_estimate(queryset, connection)
+
+        # A table that was never analyzed has no statistics.
+        if estimate is None or estimate < 0:
+            return queryset.count(), True
+
+        return int(estimate), False
+
+    def _table_estimate(self, queryset, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+
+        return row[0] if row else None
+
+    def _explain_estimate(self, queryset, connection):
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return plan[0]['Plan']['Plan Rows']
+
+
+class ThresholdCount(BaseCount):
+    """
+    Counts exactly up to `threshold` rows, then falls back to an estimate.
+    The exact count runs on a sliced subquery, so it never scans more than
+    `threshold + 1` rows.
+    """
+
+    threshold = 1000
+
+    def __init__(self, threshold=None, fallback=None):
+        if threshold is None:
+            threshold = getattr(settings, 'PAGINATION_COUNT_THRESHOLD', self.threshold)
+
+        self.threshold = threshold
+        self.fallback = fallback or EstimatedCount()
+
+    def count(self, queryset, request=None):
+        count = queryset[:self.threshold + 1].count()
+        if count <= self.threshold:
+            return count, True
+
+        estimate, is_exact = self.fallback.count(queryset, request)
+
+        # The planner may underestimate, but we know better than that.
+        return max(estimate, count), is_exact
+
+
+class CachedCount(BaseCount):
+    """
+    Caches the result of another strategy for a short time. The cache key is
+    built from the model, the path, the user and the normalized query string
+    without its pagination parameters, so every filter & ordering combination
+    is cached separately.
+    """
+
+    timeout = 30
+    key_prefix = 'drf_core:count'
+    ignored_params = NON_FILTER_PARAMS
+
+    def __init__(self, strategy=None, timeout=None, cache_alias=None):
+        if timeout is None:
+            timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', self.timeout)
+        if cache_alias is None:
+            cache_alias = getattr(settings, 'PAGINATION_COUNT_CACHE', 'default')
+
+        self.strategy = strategy or ExactCount()
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+
+    def count(self, queryset, request=None):
+        if request is None:
+            return self.strategy.count(queryset, request)
+
+        cache = caches[self.cache_alias]
+        key = self.get_cache_key(queryset, request)
+
+        result = cache.get(key)
+        if result is None:
+            result = self.strategy.count(queryset, request)
+            cache.set(key, result, self.timeout)
+
+        return tuple(result)
+
+    def get_cache_key(self, queryset, request):
+        user = getattr(request, 'user', None)
+
+        return make_cache_key(
+            self.key_prefix,
+            queryset.model._meta.label,
+            request.path,
+            getattr(user, 'pk', None),
+            normalize_params(request.query_params, self.ignored_params),
+        )
+
+
+def get_count_strategy(strategy=None):
+    """
+    Returns a strategy instance. `strategy` can be an instance, a class or a
+    dotted path; it defaults to the `PAGINATION_COUNT_STRATEGY` setting.
+    """
+    if strategy is None:
+        strategy = getattr(settings, 'PAGINATION_COUNT_STRATEGY', ExactCount)
+    if isinstance(strategy, str):
+        strategy = import_string(strategy)
+    if isinstance(strategy, type):
+        strategy = strategy()
+
+    return strategy
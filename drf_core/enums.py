@@ -1,3 +1,9 @@
+import json
+
+from django.utils.functional import Promise
+from django.utils.translation import get_language
+
+
 # ==============================================================================
 # ChoiceEnum
 # ==============================================================================
@@ -5,43 +11,102 @@
 
 class ChoiceEnum:
     """ The base class for choices enumeration. This enumeration is often
-    uses with Django fields. """
+    uses with Django fields.
+
+    The lookup indexes are built once per subclass, when the subclass is
+    created, assuming that the CHOICES field never change:
+
+        `value_set`: the frozenset of the values, for O(1) membership.
+        `labels`: the label of every value.
+
+    The indexes reading the labels are built on first use, as lazy labels
+    cannot be translated while the apps are loading.
+    """
 
     CHOICES = []
 
-    # The cached value for the name_value_json method
-    # This cache is computed only once, assumes that the CHOICES field
-    # never change.
-    _id_value_json_cached = None
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._build_indexes()
 
-    _values_cached = None
+    @classmethod
+    def _build_indexes(cls):
+        choices = tuple(cls.CHOICES)
+
+        cls._values = [data[0] for data in choices]
+        cls.value_set = frozenset(cls._values)
+        cls.labels = {data[0]: data[1] for data in choices}
+        cls._is_translated = any(isinstance(data[1], Promise) for data in choices)
+
+        # The label indexes, per language when some labels are translated.
+        cls._values_by_label = {}
+        cls._name_value = None
+        cls._name_value_json_bytes = {}
+
+    @classmethod
+    def _get_language(cls):
+        return get_language() if cls._is_translated else None
 
     @classmethod
     def values(cls):
-        if cls._values_cached:
-            return cls._values_cached
+        return cls._values
 
-        cls._values_cached = [
-            x[0]
-            for x in cls.CHOICES
-        ]
-        return cls._values_cached
+    @classmethod
+    def has_value(cls, value):
+        return value in cls.value_set
+
+    @classmethod
+    def get_label(cls, value, default=None):
+        return cls.labels.get(value, default)
+
+    @classmethod
+    def get_value(cls, label, default=None):
+        """
+        Returns the value of the label, in the active language when labels
+        are translated.
+        """
+        language = cls._get_language()
+        values_by_label = cls._values_by_label.get(language)
+        if values_by_label is None:
+            values_by_label = {str(data[1]): data[0] for data in cls.CHOICES}
+            cls._values_by_label[language] = values_by_label
+
+        return values_by_label.get(str(label), default)
 
     @classmethod
     def name_value_json(cls):
-        if cls._id_value_json_cached:
-            return cls._id_value_json_cached
-
-        choices = cls.CHOICES
-        # Builds up the catched json
-        assert choices, 'this instance must have a CHOICES field'
-        cls._id_value_json_cached = [
-            {
-                'value': data[0] or '',
-                'name': data[1] or '',
-            }
-
-            for data in choices
-        ]
-
-        return cls._id_value_json_cached
+        assert cls.CHOICES, 'this instance must have a CHOICES field'
+        if cls._name_value is None:
+            cls._name_value = [
+                {
+                    'value': data[0] or '',
+                    'name': data[1] or '',
+                }
+
+                for data in cls.CHOICES
+            ]
+
+        return cls._name_value
+
+    @classmethod
+    def name_value_json_bytes(cls):
+        """
+        Returns `name_value_json()` rendered as JSON, so that choice endpoints
+        can send it without encoding it again.
+        """
+        language = cls._get_language()
+
+        rendered = cls._name_value_json_bytes.get(language)
+        if rendered is None:
+            rendered = json.dumps(
+                cls.name_value_json(),
+                default=str,
+                ensure_ascii=False,
+                separators=(',', ':'),
+            ).encode('utf-8')
+            cls._name_value_json_bytes[language] = rendered
+
+        return rendered
+
+
+ChoiceEnum._build_indexes()
@@ -1,15 +1,141 @@
+from django.core.exceptions import EmptyResultSet
 import rest_framework_filters as filters
-from drf_core.utils import get_queryset_by_order
+from rest_framework.filters import OrderingFilter as BaseOrderingFilter
+from drf_core.cache import (
+    NON_FILTER_PARAMS,
+    get_model_versions,
+    get_version_cache,
+    make_cache_key,
+    normalize_params,
+    track_model_versions,
+)
+from drf_core.queries import get_lookup_models
+from drf_core.utils import get_ordering_policy, get_queryset_by_order
+
+
+class OrderingFilter(BaseOrderingFilter):
+    """
+    Applies the ordering through `get_queryset_by_order`, so that it gets a
+    unique tiebreaker and follows the `ordering_policy` of the view.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+
+        return get_queryset_by_order(
+            queryset=queryset,
+            ordering_by=ordering,
+            policy=get_ordering_policy(view),
+        )
 
 
 class BaseFiltering(filters.FilterSet):
+    # What to do with orderings that no index supports, see
+    # `get_queryset_by_order`. Defaults to the policy of the view.
+    ordering_policy = None
+
+    # Caches the ids matched by the filters, so that a repeated filter
+    # combination becomes a single primary key lookup. The cache is
+    # invalidated when any model involved in the filtering changes, see
+    # `drf_core.cache`.
+    cache_results = False
+    cache_timeout = 60
+    # Results with more ids than this are not cached.
+    cache_max_ids = 1000
+    cache_key_prefix = 'drf_core:filter'
+    cache_ignored_params = NON_FILTER_PARAMS
 
     def filter_queryset(self, queryset):
         """
         Override this to apply filtering & ordering at the same time.
         """
-        queryset = super(filters.FilterSet, self).filter_queryset(queryset)
-        queryset = self.filter_related_filtersets(queryset)
+        if self.cache_results:
+            queryset = self.filter_queryset_cached(queryset)
+        else:
+            queryset = self.filter_queryset_uncached(queryset)
+
+        # The ordering parameter belongs to the model of the root filterset.
+        if self.relationship is not None:
+            return queryset
+
         ordering_by = self.data.get('ordering')
         return get_queryset_by_order(queryset=queryset,
-                                     ordering_by=ordering_by)
+                                     ordering_by=ordering_by,
+                                     policy=self.get_ordering_policy())
+
+    def get_ordering_policy(self):
+        if self.ordering_policy is not None:
+            return get_ordering_policy(self)
+
+        parser_context = getattr(self.request, 'parser_context', None) or {}
+        return get_ordering_policy(parser_context.get('view'))
+
+    def filter_queryset_uncached(self, queryset):
+        queryset = super(filters.FilterSet, self).filter_queryset(queryset)
+        return self.filter_related_filtersets(queryset)
+
+    def filter_queryset_cached(self, queryset):
+        models = self.get_cache_models()
+        for model in models:
+            track_model_versions(model)
+
+        key = self.get_cache_key(queryset, models)
+        if key is None:
+            return self.filter_queryset_uncached(queryset)
+
+        cache = get_version_cache()
+        ids = cache.get(key)
+        if ids is not None:
+            return queryset.filter(pk__in=ids)
+
+        filtered = self.filter_queryset_uncached(queryset)
+        ids = list(
+            filtered.order_by().values_list('pk', flat=True)[:self.cache_max_ids + 1]
+        )
+        if len(ids) <= self.cache_max_ids:
+            cache.set(key, ids, self.cache_timeout)
+
+        return filtered
+
+    def get_cache_models(self):
+        """
+        Returns the models of this filterset, the models crossed by the lookup
+        paths of its filters, and the models of its related filtersets.
+        """
+        models = get_lookup_models(
+            self._meta.model,
+            [f.field_name for f in self.filters.values() if f.field_name],
+        )
+        for related_filterset in self.related_filtersets.values():
+            if isinstance(related_filterset, BaseFiltering):
+                related_models = related_filterset.get_cache_models()
+            else:
+                related_models = [related_filterset._meta.model]
+
+            for model in related_models:
+                if model not in models:
+                    models.append(model)
+
+        return models
+
+    def get_cache_key(self, queryset, models):
+        """
+        Builds the cache key from the base queryset, the normalized filter
+        parameters and the versions of the models. Returns None when the
+        queryset cannot be cached.
+        """
+        # The SQL of the base queryset captures any scoping applied by the
+        # view, e.g. per user.
+        try:
+            base_query = str(queryset.order_by().query)
+        except EmptyResultSet:
+            return None
+
+        return make_cache_key(
+            '{}:{}'.format(self.cache_key_prefix, self._meta.model._meta.label),
+            base_query,
+            normalize_params(self.data, self.cache_ignored_params),
+            sorted(get_model_versions(models).items()),
+        )
@@ -0,0 +1,253 @@
+""" Provides the per-request instrumentation of drf-core viewsets.
+
+    A sample of the requests records its query count, SQL time, duplicated
+    queries (e.g. N+1), serialization & render times and response size. The
+    metrics are sent to the sinks of the `METRICS_SINKS` setting, and to the
+    `Server-Timing` header.
+
+        METRICS_SAMPLE_RATE = 0.01
+        METRICS_SINKS = (
+            'drf_core.instrumentation.LoggingSink',
+            'drf_core.instrumentation.StatsdSink',
+        )
+"""
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.response import SimpleTemplateResponse
+from django.utils.module_loading import import_string
+
+from drf_core import log
+from drf_core.queries import QueryCounter
+
+try:
+    import statsd
+except ImportError:  # pragma: no cover
+    statsd = None
+
+
+# ==============================================================================
+# Sinks
+# ==============================================================================
+class BaseMetricsSink:
+    """
+    Receives the metrics of every instrumented request.
+    """
+
+    def record(self, metrics):
+        raise NotImplementedError
+
+
+class LoggingSink(BaseMetricsSink):
+    """
+    Logs the metrics as JSON.
+    """
+
+    def record(self, metrics):
+        log.info('metrics %s', json.dumps(metrics))
+
+
+class StatsdSink(BaseMetricsSink):
+    """
+    Sends the metrics to StatsD, as `<prefix>.<view>.<action>.<metric>`.
+    Times are sent as timings, the other values as gauges, requests &
+    statuses as counters.
+
+    Uses the `statsd` package with the `STATSD_HOST` & `STATSD_PORT`
+    settings, unless a client with the same interface is given.
+    """
+
+    def __init__(self, client=None, prefix='drf_core'):
+        if client is None:
+            if statsd is None:
+                raise ImproperlyConfigured('StatsdSink requires the statsd package.')
+
+            client = statsd.StatsClient(
+                getattr(settings, 'STATSD_HOST', 'localhost'),
+                getattr(settings, 'STATSD_PORT', 8125),
+            )
+
+        self.client = client
+        self.prefix = prefix
+
+    def record(self, metrics):
+        prefix = '{}.{}.{}'.format(self.prefix, metrics['view'], metrics['action'])
+
+        self.client.incr('{}.requests'.format(prefix))
+        self.client.incr('{}.status.{}'.format(prefix, metrics['status']))
+        for name, value in metrics.items():
+            if name == 'status' or not isinstance(value, (int, float)):
+                continue
+
+            stat = '{}.{}'.format(prefix, name)
+            if name.endswith('_time'):
+                self.client.timing(stat, value)
+            else:
+                self.client.gauge(stat, value)
+
+
+class MemorySink(BaseMetricsSink):
+    """
+    Keeps the metrics in memory, e.g. for tests.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, metrics):
+        self.records.append(metrics)
+
+    def clear(self):
+        self.records = []
+
+
+_sinks = None
+
+
+def get_metrics_sinks():
+    """
+    Returns the sinks of the `METRICS_SINKS` setting, instantiated once.
+    """
+    global _sinks
+
+    if _sinks is None:
+        paths = getattr(settings, 'METRICS_SINKS', ('drf_core.instrumentation.LoggingSink',))
+        _sinks = [import_string(path)() for path in paths]
+
+    return _sinks
+
+
+@receiver(setting_changed)
+def _reset_metrics_sinks(setting, **kwargs):
+    global _sinks
+
+    if setting == 'METRICS_SINKS':
+        _sinks = None
+
+
+def record_metrics(metrics):
+    for sink in get_metrics_sinks():
+        try:
+            sink.record(metrics)
+        except Exception:
+            # Metrics must never break a request.
+            log.exception('Failed to record metrics with %s', type(sink).__name__)
+
+
+def format_server_timing(metrics):
+    return ', '.join([
+        'db;dur={:.1f};desc="{} queries, {} duplicated"'.format(
+            metrics['sql_time'], metrics['queries'], metrics['duplicate_queries']
+        ),
+        'serialize;dur={:.1f}'.format(metrics['serialize_time']),
+        'render;dur={:.1f}'.format(metrics['render_time']),
+        'total;dur={:.1f}'.format(metrics['total_time']),
+    ])
+
+
+# ==============================================================================
+# InstrumentationMixin
+# ==============================================================================
+class InstrumentationMixin:
+    """
+    Instruments a sample of the requests of the view, see the module.
+    """
+
+    # The share of instrumented requests, from 0 to 1. Defaults to the
+    # `METRICS_SAMPLE_RATE` setting, then to 0.
+    metrics_sample_rate = None
+
+    # Adds the `Server-Timing` header to the instrumented responses. Defaults
+    # to the `SERVER_TIMING` setting, then to `DEBUG`.
+    server_timing = None
+
+    # The number of duplicated queries reported in the metrics.
+    metrics_max_duplicates = 5
+
+    def should_instrument(self, request):
+        rate = self.metrics_sample_rate
+        if rate is None:
+            rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0)
+
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.should_instrument(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        self._serialize_time = 0.0
+        start = time.perf_counter()
+
+        with QueryCounter() as counter:
+            response = super().dispatch(request, *args, **kwargs)
+
+            # Renders now, Django would render the response right after.
+            render_start = time.perf_counter()
+            if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                response.render()
+            render_time = time.perf_counter() - render_start
+
+        metrics = self.get_metrics(
+            response, counter, render_time, time.perf_counter() - start
+        )
+
+        server_timing = self.server_timing
+        if server_timing is None:
+            server_timing = getattr(settings, 'SERVER_TIMING', settings.DEBUG)
+        if server_timing:
+            response['Server-Timing'] = format_server_timing(metrics)
+
+        record_metrics(metrics)
+        return response
+
+    def get_metrics(self, response, counter, render_time, total_time):
+        """
+        Returns the metrics of the request, times in milliseconds.
+        """
+        request = self.request
+        action = getattr(self, 'action', None) or request.method.lower()
+
+        return {
+            'view': type(self).__name__,
+            'action': action,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': counter.count,
+            'sql_time': counter.time * 1000,
+            'duplicate_queries': counter.duplicate_count,
+            'duplicates': [
+                {'sql': sql, 'count': count}
+                for sql, count in counter.get_duplicates()[:self.metrics_max_duplicates]
+            ],
+            'serialize_time': self._serialize_time * 1000,
+            'render_time': render_time * 1000,
+            'total_time': total_time * 1000,
+            'response_size': (
+                None if getattr(response, 'streaming', False) else len(response.content)
+            ),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if getattr(self, '_serialize_time', None) is None:
+            return serializer
+
+        # Times the serialization of the root serializer, the nested ones
+        # are part of it.
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            start = time.perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                self._serialize_time += time.perf_counter() - start
+
+        serializer.to_representation = timed_to_representation
+        return serializer
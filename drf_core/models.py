@@ -1,9 +1,20 @@
+import binascii
+import os
+import threading
+from contextlib import contextmanager
+
 from django.db.models import ( # noqa
     Model as BaseModel,
+    Manager as BaseManager,
+    Index,
+    Q,
     SET_NULL
 )
 from django.conf import settings
+from django.db import connections, transaction
 from django.db.models.query import QuerySet as BaseQuerySet
+from django.db.models.signals import class_prepared, post_save
+from django.utils import timezone
 
 from django_extensions.db.models import (
     TimeStampedModel as BaseTimeStampedModel
@@ -11,18 +22,116 @@ from django_extensions.db.models import (
 from rest_framework.authtoken.models import Token
 
 from drf_core import fields
+from drf_core.cache import notify_model_change
 
 
 # ==============================================================================
 # ArchivableModelMixin
 # ==============================================================================
 class QuerySet(BaseQuerySet):
+    """
+    QuerySet
+
+    Bulk writes notify `drf_core.cache` so that the cached results depending
+    on the model are invalidated, they do not send model signals.
+    """
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        notify_model_change(self.model, using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        result = super().delete()
+        notify_model_change(self.model, using=self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        notify_model_change(self.model, using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        notify_model_change(self.model, using=self.db)
+        return rows
+
+    bulk_update.alters_data = True
+
+    def update_by(self, user, **kwargs):
+        """
+        Updates all objects of the queryset in a single UPDATE, which also
+        stamps the contributor of contributor models.
+        """
+        get_contributor_values = getattr(self.model, 'get_contributor_values', None)
+        if get_contributor_values is not None:
+            kwargs.update(get_contributor_values(user))
+            if 'modified' not in kwargs:
+                kwargs['modified'] = timezone.now()
+
+        return self.update(**kwargs)
+
+    update_by.alters_data = True
+
     def archived_only(self):
         return self.filter(archived=True)
 
     def non_archived_only(self):
         return self.filter(archived=False)
 
+    def archive(self, user=None):
+        """
+        Archives all objects of the queryset in a single UPDATE, returns the
+        number of archived rows.
+        """
+        return self.update(**self.model.get_archive_values(True, user))
+
+    def unarchive(self, user=None):
+        """
+        Unarchives all objects of the queryset in a single UPDATE, returns
+        the number of unarchived rows.
+        """
+        return self.update(**self.model.get_archive_values(False, user))
+
+
+def bulk_create_with_pks(manager, objs, batch_size=None):
+    """
+    Inserts the objects and makes sure their primary keys are set. The
+    objects are inserted with `bulk_create` on databases that return the
+    inserted rows, and saved one by one in a transaction on the others.
+
+    Users get their API keys in batch when their model is connected with
+    `connect_api_keys`, as `bulk_create` sends no `post_save`.
+    """
+    objs = list(objs)
+    using = manager.db
+    with transaction.atomic(using=using, savepoint=False):
+        if not connections[using].features.can_return_rows_from_bulk_insert:
+            # The inserted ids cannot be read back safely under concurrent
+            # inserts, each save returns its own id.
+            with defer_api_keys():
+                for obj in objs:
+                    obj.save(force_insert=True, using=using)
+            return objs
+
+        objs = manager.bulk_create(objs, batch_size=batch_size)
+        if objs and has_api_keys(manager.model):
+            provision_tokens(objs, batch_size=batch_size)
+
+    return objs
+
+
+class NonArchivedManager(BaseManager.from_queryset(QuerySet)):
+    """
+    Manager that hides archived objects.
+    """
+    def get_queryset(self):
+        return super().get_queryset().non_archived_only()
+
 
 class ArchivableModelMixin(BaseModel):
     """
@@ -30,10 +139,17 @@ class ArchivableModelMixin(BaseModel):
 
     Mixin class that provides an `archived` field. This field is used
     to archive objects instead of deleting them from the database.
+
+    Fields listed in `live_lookup_fields` get a partial index restricted to
+    non-archived rows, see `get_live_indexes`.
     """
     objects = QuerySet.as_manager()
 
-    id = models.AutoField(primary_key=True)
+    # The fields (or tuples of fields) that are often looked up on
+    # non-archived rows.
+    live_lookup_fields = ()
+
+    id = fields.AutoField(primary_key=True)
 
     archived = fields.BooleanField(
         default=False,
@@ -43,19 +159,101 @@ class ArchivableModelMixin(BaseModel):
     class Meta:
         abstract = True
 
-    def archive(self):
+    @classmethod
+    def get_archive_values(cls, archived, user=None):
+        """
+        Returns the column values written when archiving or unarchiving,
+        keyed by attribute name.
+        """
+        return {'archived': archived}
+
+    def archive(self, user=None):
         """
         Archives the model.
         """
-        self.archived = True
-        self.save()
+        self._set_archived(True, user)
 
-    def unarchive(self):
+    def unarchive(self, user=None):
         """
         Unarchives the model.
         """
-        self.archived = False
-        self.save()
+        self._set_archived(False, user)
+
+    def _set_archived(self, archived, user):
+        values = self.get_archive_values(archived, user)
+        for attname, value in values.items():
+            setattr(self, attname, value)
+
+        self.save(update_fields=list(values))
+
+
+class NonArchivedModelMixin(BaseModel):
+    """
+    NonArchivedModelMixin
+
+    Opt-in mixin whose default manager excludes archived objects, so that
+    consumers no longer have to call `non_archived_only()`. Archived objects
+    remain reachable through `all_objects`.
+
+    For example:
+        class Book(NonArchivedModelMixin, ContributorModel):
+            live_lookup_fields = ('code',)
+    """
+    objects = NonArchivedManager()
+    all_objects = QuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
+def get_live_indexes(model, lookups):
+    """
+    Returns the partial indexes (`WHERE archived = false`) of the given
+    lookups. A lookup is a field name or a tuple of field names.
+    """
+    indexes = []
+    for lookup in lookups:
+        field_names = list(lookup) if isinstance(lookup, (list, tuple)) else [lookup]
+
+        # Names the index like Django does, with a suffix of its own so that
+        # it never clashes with a plain index on the same fields.
+        index = Index(fields=field_names)
+        index.suffix = 'liv'
+        index.set_name_with_model(model)
+
+        indexes.append(Index(
+            fields=field_names,
+            name=index.name,
+            condition=Q(archived=False),
+        ))
+
+    return indexes
+
+
+def add_live_indexes(sender, **kwargs):
+    """
+    Adds the partial indexes of `live_lookup_fields` to the model indexes,
+    so that they are picked up by migrations.
+    """
+    opts = sender._meta
+    lookups = getattr(sender, 'live_lookup_fields', None)
+    if not lookups or opts.abstract or opts.proxy:
+        return
+
+    # Multi-table children cannot index the fields of their parents.
+    if not any(field.name == 'archived' for field in opts.local_concrete_fields):
+        return
+
+    names = {index.name for index in opts.indexes}
+    for index in get_live_indexes(sender, lookups):
+        if index.name not in names:
+            opts.indexes.append(index)
+
+    # Migrations only read the indexes declared in Meta.
+    opts.original_attrs['indexes'] = opts.indexes
+
+
+class_prepared.connect(add_live_indexes)
 
 
 # ==============================================================================
@@ -65,10 +263,106 @@ class TimeStampedModel(BaseTimeStampedModel, ArchivableModelMixin):
     class Meta:
         abstract = True
 
+    @classmethod
+    def get_archive_values(cls, archived, user=None):
+        values = super().get_archive_values(archived, user)
+        values['modified'] = timezone.now()
+        return values
+
+
+# The users whose API keys are provisioned at the end of `defer_api_keys`.
+_deferred_api_keys = threading.local()
+
+# The lowercased labels of the models connected with `connect_api_keys`.
+_api_key_models = set()
+
 
 def create_api_key(sender, instance, created, **kwargs):
     if kwargs.get('raw', False) is False and created is True:
-        Token.objects.create(user=instance)
+        deferred = getattr(_deferred_api_keys, 'users', None)
+        if deferred is not None:
+            deferred.append(instance)
+        else:
+            Token.objects.create(user=instance)
+
+
+def connect_api_keys(model=None):
+    """
+    Connects `create_api_key` to the `post_save` of the model, a class or a
+    label, the user model by default. Unlike a direct `post_save.connect`,
+    the API keys of its bulk inserts are provisioned too, see
+    `bulk_create_with_pks`.
+    """
+    model = model or settings.AUTH_USER_MODEL
+    post_save.connect(create_api_key, sender=model)
+    _api_key_models.add(
+        model.lower() if isinstance(model, str) else model._meta.label_lower
+    )
+
+
+def has_api_keys(model):
+    """
+    Returns whether `create_api_key` was connected to the model with
+    `connect_api_keys`.
+    """
+    return model._meta.label_lower in _api_key_models
+
+
+@contextmanager
+def defer_api_keys():
+    """
+    Defers the API keys of the users created in the block, and provisions
+    them in batch at the end of the block.
+
+    For example:
+        with defer_api_keys():
+            for row in rows:
+                User.objects.create(**row)
+    """
+    if getattr(_deferred_api_keys, 'users', None) is not None:
+        # The outermost block provisions the keys.
+        yield
+        return
+
+    _deferred_api_keys.users = []
+    try:
+        yield
+        users = _deferred_api_keys.users
+    finally:
+        _deferred_api_keys.users = None
+
+    provision_tokens(users)
+
+
+def provision_tokens(users, batch_size=None):
+    """
+    Creates the missing API keys of the users, a queryset or a list of saved
+    users, with bulk inserts. The keys are generated in batch. Returns the
+    created tokens.
+    """
+    batch_size = batch_size or 1000
+    if isinstance(users, BaseQuerySet):
+        user_ids = list(users.values_list('pk', flat=True))
+    else:
+        user_ids = list(dict.fromkeys(user.pk for user in users if user.pk is not None))
+
+    tokens = []
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        existing = set(
+            Token.objects.filter(user_id__in=chunk).values_list('user_id', flat=True)
+        )
+        missing = [user_id for user_id in chunk if user_id not in existing]
+
+        # A single call to the random source for the whole chunk.
+        random = binascii.hexlify(os.urandom(20 * len(missing))).decode()
+        created = [
+            Token(key=random[index * 40:(index + 1) * 40], user_id=user_id)
+            for index, user_id in enumerate(missing)
+        ]
+        tokens.extend(Token.objects.bulk_create(created))
+
+    return tokens
 
 
 # ==============================================================================
@@ -110,3 +404,24 @@ class ContributorModel(TimeStampedModel):
 
     class Meta:
         abstract = True
+
+    @classmethod
+    def get_contributor_values(cls, user, created=False):
+        """
+        Returns the contributor ids to write for a change made by the user,
+        keyed by attribute name. The ids are assigned directly, so that no
+        user is fetched.
+        """
+        if user is None or user.pk is None:
+            return {}
+
+        values = {'last_modified_by_id': user.pk}
+        if created:
+            values['created_by_id'] = user.pk
+        return values
+
+    @classmethod
+    def get_archive_values(cls, archived, user=None):
+        values = super().get_archive_values(archived, user)
+        values.update(cls.get_contributor_values(user))
+        return values
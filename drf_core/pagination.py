@@ -1,5 +1,20 @@
 # Define the paginations for resources
+import base64
+import binascii
+import json
+import zlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import OrderBy
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from drf_core.counting import get_count_strategy
+from drf_core.utils import to_json_value
 # from configs import constants
 
 
@@ -12,3 +27,443 @@ class BasePagination(pagination.LimitOffsetPagination):
     limit_query_param = 'limit'
     offset_query_param = 'offset'
     template = 'rest_framework/pagination/numbers.html'
+
+    # The counting strategy, see `drf_core.counting`. Defaults to the
+    # `PAGINATION_COUNT_STRATEGY` setting, then to an exact count.
+    count_strategy = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        strategy = get_count_strategy(self.count_strategy)
+        self.count, self.count_is_exact = strategy.count(queryset, request)
+        self.offset = self.get_offset(request)
+
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count_is_exact:
+            if self.count == 0 or self.offset > self.count:
+                return []
+            return list(queryset[self.offset:self.offset + self.limit])
+
+        # An estimated count may be off either way, so one more row is
+        # fetched to know whether there is a next page.
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+
+        return results[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_exact': self.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+
+        return response_schema
+
+    def get_next_link(self):
+        if self.count_is_exact:
+            return super().get_next_link()
+
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        offset = self.offset + self.limit
+
+        return replace_query_param(url, self.offset_query_param, offset)
+
+
+# ==============================================================================
+# KeysetPagination
+# ==============================================================================
+class KeysetPagination(pagination.BasePagination):
+    """
+    Keyset (seek) pagination for large tables.
+
+    Instead of `OFFSET n`, every page is fetched with a `WHERE (col, id) >
+    (...)` predicate built from the last row of the previous page, so deep
+    pages cost the same as the first one. The cursor is opaque to clients and
+    is built from the active ordering of the queryset, including orderings
+    applied by `get_queryset_by_order` or `OrderingFilter`. The primary key is
+    always appended as a tiebreaker so the ordering is unique.
+
+    The total count is skipped by default; set `include_count = True` to
+    report it anyway.
+
+    Select it per viewset:
+
+        class BookViewSet(BaseViewSet):
+            pagination_class = KeysetPagination
+    """
+
+    default_limit = BasePagination.default_limit
+    limit_query_param = BasePagination.limit_query_param
+    max_limit = None
+    cursor_query_param = 'cursor'
+
+    # Used when neither the queryset nor the model define an ordering.
+    default_ordering = ('pk',)
+
+    include_count = False
+    invalid_cursor_message = 'Invalid cursor'
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        keys = self.get_ordering_keys(queryset)
+        position, reverse = self.decode_cursor(request, keys)
+
+        if self.include_count:
+            self.count = queryset.count()
+
+        if reverse:
+            keys_to_apply = [self._flip(key) for key in keys]
+        else:
+            keys_to_apply = keys
+
+        queryset = queryset.order_by(
+            *[self._order_expression(key) for key in keys_to_apply]
+        )
+
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    self._seek_filter(keys_to_apply, position)
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        try:
+            results = list(queryset[:self.limit + 1])
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.keys = keys
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        response_data = [
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]
+        if self.include_count:
+            response_data.insert(0, ('count', self.count))
+
+        return Response(dict(response_data))
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            'next': {
+                'type': 'string',
+                'nullable': True,
+            },
+            'previous': {
+                'type': 'string',
+                'nullable': True,
+            },
+            'results': schema,
+        }
+        if self.include_count:
+            properties['count'] = {
+                'type': 'integer',
+                'example': 123,
+            }
+
+        return {
+            'type': 'object',
+            'properties': properties,
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {
+                    'type': 'string',
+                },
+            },
+            {
+                'name': self.limit_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {
+                    'type': 'integer',
+                },
+            },
+        ]
+
+    def get_limit(self, request):
+        try:
+            return pagination._positive_int(
+                request.query_params[self.limit_query_param],
+                strict=True,
+                cutoff=self.max_limit
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if not self.page:
+            # The previous page of an empty page is the first page.
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # --------------------------------------------------------------------------
+    # Ordering
+    # --------------------------------------------------------------------------
+    def get_ordering_keys(self, queryset):
+        """
+        Returns the active ordering of the queryset as a list of
+        `(name, descending, nullable, nulls_last)` tuples, with the primary
+        key appended as a unique tiebreaker.
+        """
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        if not ordering:
+            ordering = list(self.default_ordering)
+
+        opts = queryset.model._meta
+        pk_names = {'pk', opts.pk.name, opts.pk.attname}
+        keys = []
+
+        for item in ordering:
+            if isinstance(item, OrderBy) and isinstance(item.expression, F):
+                name, descending = item.expression.name, item.descending
+            elif isinstance(item, str) and item != '?':
+                descending = item.startswith('-')
+                name = item.lstrip('-+')
+            else:
+                # Random or expression based orderings cannot be sought.
+                continue
+
+            name, nullable = self._resolve_field(queryset.model, name)
+            keys.append((name, descending, nullable, True))
+
+            if name in pk_names:
+                # The primary key is unique, the keys after it are useless.
+                return keys
+
+        # The tiebreaker follows the direction of the last key, so that a
+        # composite index on (col, id) can be scanned in either direction.
+        descending = keys[-1][1] if keys else False
+        keys.append(('pk', descending, False, True))
+
+        return keys
+
+    def _resolve_field(self, model, name):
+        """
+        Returns the name to sort on and whether the field is nullable.
+        Relations are sorted on their raw column (e.g. `author_id`), the
+        nullability of unknown names (e.g. annotations) is assumed.
+        """
+        parts = name.split(LOOKUP_SEP)
+        opts = model._meta
+        nullable = False
+
+        for index, part in enumerate(parts):
+            if part == 'pk':
+                field = opts.pk
+            else:
+                try:
+                    field = opts.get_field(part)
+                except FieldDoesNotExist:
+                    return name, True
+
+            nullable = nullable or field.null
+            is_last = index == len(parts) - 1
+
+            if field.is_relation:
+                if is_last:
+                    if field.many_to_one or field.one_to_one and field.concrete:
+                        parts[index] = field.attname
+                        return LOOKUP_SEP.join(parts), nullable
+                    return name, True
+
+                # Reverse and many-to-many relations are nullable by nature.
+                nullable = nullable or not field.concrete
+                opts = field.related_model._meta
+
+        return name, nullable
+
+    def _flip(self, key):
+        name, descending, nullable, nulls_last = key
+        return name, not descending, nullable, not nulls_last
+
+    def _order_expression(self, key):
+        name, descending, nullable, nulls_last = key
+        if not nullable:
+            return '-' + name if descending else name
+
+        # Nullable keys sort their NULLs explicitly, so that the seek
+        # predicate does not depend on the database default.
+        if descending:
+            return F(name).desc(nulls_last=nulls_last, nulls_first=not nulls_last)
+        return F(name).asc(nulls_last=nulls_last, nulls_first=not nulls_last)
+
+    def _seek_filter(self, keys, position):
+        """
+        Builds the predicate matching every row after `position`:
+
+            k1 > v1 OR (k1 = v1 AND (k2 > v2 OR (k2 = v2 AND ...)))
+
+        A redundant `k1 >= v1` bound is added in front so that the database
+        can use a range scan on the index of the first key.
+        """
+        predicate = None
+
+        for key, value in reversed(list(zip(keys, position))):
+            after, equal = self._key_filters(key, value)
+            if predicate is None:
+                predicate = after
+            else:
+                predicate = after | (equal & predicate)
+
+        name, descending, nullable, _ = keys[0]
+        value = position[0]
+        if value is not None and not nullable:
+            lookup = 'lte' if descending else 'gte'
+            predicate = Q(**{f'{name}__{lookup}': value}) & predicate
+
+        return predicate
+
+    def _key_filters(self, key, value):
+        """
+        Returns the `(after, equal)` predicates of a single key.
+        """
+        name, descending, nullable, nulls_last = key
+
+        if value is None:
+            equal = Q(**{f'{name}__isnull': True})
+            if nulls_last:
+                # NULLs come last, nothing follows them.
+                return Q(pk__in=[]), equal
+            return Q(**{f'{name}__isnull': False}), equal
+
+        lookup = 'lt' if descending else 'gt'
+        after = Q(**{f'{name}__{lookup}': value})
+        if nullable and nulls_last:
+            after = after | Q(**{f'{name}__isnull': True})
+
+        return after, Q(**{name: value})
+
+    # --------------------------------------------------------------------------
+    # Cursor
+    # --------------------------------------------------------------------------
+    def decode_cursor(self, request, keys):
+        """
+        Returns the `(position, reverse)` pair encoded in the request cursor,
+        `(None, False)` when the request has no cursor.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            )
+            if not isinstance(data, dict):
+                raise ValueError('The cursor must be an object.')
+
+            position = data['p']
+            reverse = bool(data['r'])
+            signature = data['o']
+
+            # The position holds one scalar value per ordering key.
+            if not isinstance(position, list) or not all(
+                value is None or isinstance(value, (str, int, float))
+                for value in position
+            ):
+                raise ValueError('The cursor position must be a list of values.')
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        # The cursor must have been built from the same ordering.
+        if signature != self._signature(keys) or len(position) != len(keys):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, row, reverse):
+        data = {
+            'p': [to_json_value(self._get_value(row, key[0]))
+                  for key in self.keys],
+            'r': int(reverse),
+            'o': self._signature(self.keys),
+        }
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _signature(self, keys):
+        ordering = ','.join(
+            ('-' if descending else '') + name
+            for name, descending, _, _ in keys
+        )
+        return zlib.crc32(ordering.encode('utf-8'))
+
+    def _get_value(self, row, name):
+        if isinstance(row, dict):
+            if name == 'pk' and 'pk' not in row:
+                name = 'id'
+            return row.get(name)
+
+        value = row
+        for part in name.split(LOOKUP_SEP):
+            if value is None:
+                return None
+            value = getattr(value, part)
+
+        return value
@@ -0,0 +1,30 @@
+""" Provides the JSON parser of drf-core, the counterpart of
+    `drf_core.renderers.CoreJSONRenderer`.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from drf_core.renderers import CoreJSONRenderer, get_json_backend, orjson
+
+
+class CoreJSONParser(JSONParser):
+    """
+    Parses JSON with orjson when it is installed. orjson only reads UTF-8
+    and always rejects `NaN` & `Infinity`, other requests are left to the
+    DRF parser.
+    """
+    renderer_class = CoreJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if (get_json_backend() != 'orjson' or not self.strict
+                or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8')):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
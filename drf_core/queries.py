@@ -0,0 +1,250 @@
+""" Provides helpers for shaping and measuring the database queries issued
+    by viewsets.
+"""
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.relations import (
+    ManyRelatedField,
+    PrimaryKeyRelatedField,
+    RelatedField,
+)
+
+
+# ==============================================================================
+# QueryPlan
+# ==============================================================================
+QueryPlan = namedtuple('QueryPlan', ['select_related', 'prefetch_related'])
+
+EMPTY_QUERY_PLAN = QueryPlan((), ())
+
+# The plans already built, per serializer class.
+_query_plans = {}
+
+
+def get_query_plan(serializer_class):
+    """
+    Returns the `QueryPlan` needed to serialize instances with
+    `serializer_class` without N+1 queries. The plan is built by walking the
+    nested serializers & related fields, and is cached per serializer class.
+    """
+    plan = _query_plans.get(serializer_class)
+    if plan is None:
+        plan = build_query_plan(serializer_class)
+        _query_plans[serializer_class] = plan
+
+    return plan
+
+
+def build_query_plan(serializer_class):
+    try:
+        serializer = serializer_class(context={})
+        model = serializer.Meta.model
+    except Exception:
+        # Serializers that cannot be built without a request, or that are
+        # not bound to a model, cannot be planned.
+        return EMPTY_QUERY_PLAN
+
+    select_related = set()
+    prefetch_related = set()
+    _walk_serializer(serializer, model, '', False, select_related, prefetch_related)
+
+    # Prefetching `a__b` already fetches `a`, selecting it too is useless.
+    select_related = {
+        path for path in select_related
+        if not any(prefetch.startswith(path + '__') or prefetch == path
+                   for prefetch in prefetch_related)
+    }
+
+    return QueryPlan(
+        tuple(sorted(select_related)),
+        tuple(sorted(prefetch_related)),
+    )
+
+
+def _walk_serializer(serializer, model, prefix, in_prefetch,
+                     select_related, prefetch_related):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        nested = field
+        if isinstance(nested, serializers.ListSerializer):
+            nested = nested.child
+
+        if field.source == '*':
+            if isinstance(nested, serializers.BaseSerializer):
+                _walk_serializer(nested, model, prefix, in_prefetch,
+                                 select_related, prefetch_related)
+            continue
+
+        _walk_source(field, nested, model, prefix, in_prefetch,
+                     select_related, prefetch_related)
+
+
+def _walk_source(field, nested, model, prefix, in_prefetch,
+                 select_related, prefetch_related):
+    source_attrs = field.source.split('.')
+
+    for index, attr in enumerate(source_attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Properties & methods cannot be planned.
+            return
+
+        if not model_field.is_relation:
+            return
+
+        is_last = index == len(source_attrs) - 1
+        to_one = model_field.many_to_one or model_field.one_to_one
+
+        # A primary key related field reads the raw `<name>_id` column.
+        if (is_last and to_one and model_field.concrete
+                and _uses_pk_only(field)):
+            return
+
+        path = prefix + attr
+
+        if model_field.related_model is None:
+            # Generic foreign keys can only be prefetched.
+            prefetch_related.add(path)
+            return
+
+        if to_one and not in_prefetch:
+            select_related.add(path)
+        else:
+            prefetch_related.add(path)
+            in_prefetch = True
+
+        model = model_field.related_model
+        prefix = path + '__'
+
+    if isinstance(nested, serializers.BaseSerializer):
+        _walk_serializer(nested, model, prefix, in_prefetch,
+                         select_related, prefetch_related)
+
+
+def _uses_pk_only(field):
+    if isinstance(field, ManyRelatedField):
+        return False
+    if isinstance(field, PrimaryKeyRelatedField):
+        return True
+    if isinstance(field, RelatedField):
+        return field.use_pk_only_optimization()
+
+    return False
+
+
+def apply_query_plan(queryset, plan):
+    """
+    Applies the `select_related` & `prefetch_related` of the plan.
+    """
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*plan.prefetch_related)
+
+    return queryset
+
+
+def get_query_plan_models(model, plan):
+    """
+    Returns the models whose rows are read when the plan is applied to a
+    queryset of `model`, starting with the model itself.
+    """
+    return get_lookup_models(model, plan.select_related + plan.prefetch_related)
+
+
+def get_lookup_models(model, lookups):
+    """
+    Returns the models crossed by the lookups, e.g. `author__name`, from
+    `model`, starting with the model itself. The walk of a lookup stops at
+    its first part that is not a relation.
+    """
+    models = [model]
+    for lookup in lookups:
+        current = model
+        for attr in lookup.split('__'):
+            try:
+                current = current._meta.get_field(attr).related_model
+            except FieldDoesNotExist:
+                current = None
+            if current is None:
+                break
+
+            if current not in models:
+                models.append(current)
+
+    return models
+
+
+# ==============================================================================
+# QueryCounter
+# ==============================================================================
+class QueryCounter:
+    """
+    Counts & times the queries run while the counter is active. Counts every
+    database by default.
+
+        with QueryCounter() as counter:
+            ...
+        print(counter.count, counter.time, counter.get_duplicates())
+
+    Queries are told apart by their SQL with placeholders, so the same query
+    run with other parameters, e.g. row by row, is a duplicate.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+        self.count = 0
+        # The total time spent in the database, in seconds.
+        self.time = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.signatures[sql] += 1
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+
+    def get_duplicates(self):
+        """
+        Returns the `(sql, count)` of the queries run more than once, the most
+        repeated first.
+        """
+        return [
+            (sql, count) for sql, count in self.signatures.most_common()
+            if count > 1
+        ]
+
+    @property
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.signatures.values() if count > 1)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+
+        if self.using is None:
+            aliases = [connection.alias for connection in connections.all()]
+        else:
+            aliases = [self.using]
+
+        for alias in aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.close()
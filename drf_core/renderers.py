@@ -0,0 +1,94 @@
+""" Provides the JSON renderer of drf-core.
+
+    It renders with orjson when it is installed, and falls back to the
+    stdlib json module like the DRF renderer otherwise. Values orjson does
+    not encode natively, e.g. Decimal or lazy strings, go through the DRF
+    encoder, so both backends produce the same output for API payloads.
+
+    Select it through the DRF settings:
+
+        REST_FRAMEWORK = {
+            'DEFAULT_RENDERER_CLASSES': (
+                'drf_core.renderers.CoreJSONRenderer',
+                'rest_framework.renderers.BrowsableAPIRenderer',
+            ),
+            'DEFAULT_PARSER_CLASSES': (
+                'drf_core.parsers.CoreJSONParser',
+                ...
+            ),
+        }
+
+    The `JSON_BACKEND` setting forces `json` or `orjson`.
+"""
+import math
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def get_json_backend():
+    """
+    Returns `orjson` when it is installed, unless the `JSON_BACKEND` setting
+    asks for `json`.
+    """
+    backend = getattr(settings, 'JSON_BACKEND', None)
+    if backend == 'json' or orjson is None:
+        return 'json'
+    if backend not in (None, 'orjson'):
+        raise ValueError('Unknown JSON backend: {}'.format(backend))
+
+    return 'orjson'
+
+
+class CoreJSONRenderer(JSONRenderer):
+    """
+    A drop-in replacement of the DRF `JSONRenderer` using orjson for compact
+    output. Indented & ASCII-only output are left to the DRF renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (get_json_backend() != 'orjson' or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                # Keeps the datetime format of the DRF encoder.
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            # e.g. integers over 64 bits.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson writes NaN & infinities as null: the DRF renderer raises
+        # on them in strict mode, and writes them as is otherwise.
+        if b'null' in ret and _has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escapes U+2028 & U+2029 like the DRF renderer, so that the output
+        # stays a strict JavaScript subset.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
+
+
+def _has_non_finite_float(data):
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(_has_non_finite_float(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite_float(value) for value in data)
+
+    return False
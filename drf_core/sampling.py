@@ -1,8 +1,26 @@
+import base64
+import datetime
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pydoc import locate
 from importlib import import_module
+from django.apps import apps as django_apps
 from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models.deletion import Collector
+from factory.random import reseed_random
+from drf_core.factories import Iterator, SubFactory
 
-from drf_core.utils import pluralize
+from drf_core import log
+from drf_core.models import bulk_create_with_pks, defer_api_keys
+from drf_core.utils import pluralize, to_json_value
 
 
 class Sampling(object):
@@ -10,19 +28,33 @@ class Sampling(object):
     def __init__(self):
         # How many records will be created for each model.
         self.sampling_records = 50
+        # How many rows are inserted per statement in batch mode.
+        self.batch_size = 1000
         self.apps = settings.API_APPS
         self.factories = {}
         self.data = {}
+        # The ids of every generated row as `IdRanges`, keyed by model label.
+        self.generated_ids = {}
+        # The throughput of the last `generate_parallel` call.
+        self.report = {}
+        self._pools = {}
 
         if hasattr(settings, 'SAMPLING_RECORDS'):
             self.sampling_records = settings.SAMPLING_RECORDS
 
+        if hasattr(settings, 'SAMPLING_BATCH_SIZE'):
+            self.batch_size = settings.SAMPLING_BATCH_SIZE
+
         self._import_factories()
 
-    def generate_all(self):
-        # Gererate all data
+    def generate_all(self, batch=False):
+        """
+        Generate data for all models. In batch mode, the rows of each model
+        are built in memory and inserted with `bulk_create`, see
+        `generate_batch`.
+        """
         for app, factory_apps in self.factories.items():
-            self.data[app] = {}
+            self.data.setdefault(app, {})
 
             for factory_app in factory_apps:
                 items = []
@@ -32,13 +64,119 @@ class Sampling(object):
                 if model_name in ['User', 'SuperUser']:
                     sampling=5
 
-                for _ in range(0, sampling):
-                    item = factory_app()
-                    items.append(item)
+                if batch:
+                    items = self.generate_batch(factory_app, sampling)
+                else:
+                    with defer_api_keys():
+                        for _ in range(0, sampling):
+                            item = factory_app()
+                            items.append(item)
+                    self._track(items)
 
-                self.data[app][model_name] = items
+                self.data[app].setdefault(model_name, []).extend(items)
 
-    def generate_by_model(self, app_name, model_name, sampling=0):
+    def generate_parallel(self, workers=None, seed=None):
+        """
+        Generate data for all models in batch mode, ordered by their foreign
+        key dependencies. The models of a same dependency level are
+        generated concurrently in a process pool, each worker with its own
+        database connection and a deterministic seed.
+
+        Falls back to a serial run with a single worker, on SQLite (which
+        serializes writes anyway) and inside a transaction (which the
+        workers cannot see).
+
+        Returns the throughput of every model, which is also logged.
+        """
+        if seed is None:
+            seed = getattr(settings, 'SAMPLING_SEED', 0)
+        workers = workers or os.cpu_count() or 1
+
+        jobs = []
+        for app, factory_apps in self.factories.items():
+            for factory_app in factory_apps:
+                model_name = factory_app.__name__.replace('Factory', '')
+                sampling = self.sampling_records
+                if model_name in ['User', 'SuperUser']:
+                    sampling = 5
+
+                # The seed only depends on the position of the factory.
+                jobs.append((app, model_name, factory_app, sampling, seed + len(jobs)))
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        parallel = (
+            workers > 1
+            and connection.vendor != 'sqlite'
+            and not connection.in_atomic_block
+        )
+
+        executor = None
+        if parallel:
+            # Forked workers must not inherit the parent connections.
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+            )
+
+        self.report = {}
+        levels = get_dependency_levels([job[2]._meta.model for job in jobs])
+
+        try:
+            for level in levels:
+                level_jobs = [job for job in jobs if job[2]._meta.model in level]
+
+                if executor is None:
+                    for job in level_jobs:
+                        self._run_job(*job)
+                    continue
+
+                futures = [
+                    (job, executor.submit(
+                        _generate_worker,
+                        '{}.{}'.format(job[2].__module__, job[2].__name__),
+                        job[3],
+                        self.batch_size,
+                        job[4],
+                        self.generated_ids,
+                    ))
+                    for job in level_jobs
+                ]
+
+                for job, future in futures:
+                    generated_ids, seconds = future.result()
+                    for label, ids in generated_ids.items():
+                        self.generated_ids.setdefault(label, IdRanges()).update(ids)
+                    self._report(job[0], job[1], job[3], seconds)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return self.report
+
+    def _run_job(self, app, model_name, factory_app, sampling, seed):
+        reseed_random(seed)
+        started = time.perf_counter()
+
+        items = self.generate_batch(factory_app, sampling)
+        self.data.setdefault(app, {}).setdefault(model_name, []).extend(items)
+
+        self._report(app, model_name, sampling, time.perf_counter() - started)
+
+    def _report(self, app, model_name, records, seconds):
+        rows_per_second = records / seconds if seconds else 0
+        self.report[f'{app}.{model_name}'] = {
+            'records': records,
+            'seconds': seconds,
+            'rows_per_second': rows_per_second,
+        }
+
+        log.info(
+            'Generated %s %s.%s rows in %.2fs (%.0f rows/s)',
+            records, app, model_name, seconds, rows_per_second
+        )
+
+    def generate_by_model(self, app_name, model_name, sampling=0, batch=False):
         """
         Generate data for a single model.
         """
@@ -55,29 +193,360 @@ class Sampling(object):
         if sampling == 0:
             sampling = self.sampling_records
 
-        for _ in range(0, sampling):
-            item = factory()
-            items.append(item)
-            self.data[app_name][model_name].append(item)
+        if batch:
+            items = self.generate_batch(factory, sampling)
+            self.data[app_name][model_name].extend(items)
+            return items
+
+        # Users get their API keys in batch.
+        with defer_api_keys():
+            for _ in range(0, sampling):
+                item = factory()
+                items.append(item)
+                self.data[app_name][model_name].append(item)
 
+        self._track(items)
         return items
 
-    def clean_up(self):
-        # Clean all generated data.
-        for app, data_models in self.data.items():
-            for model_name, items in data_models.items():
-                try:
-                    # Load model
-                    ids = []
-                    model = locate(f'{app}.models.{model_name}')
+    def generate_batch(self, factory, sampling, batch_size=None):
+        """
+        Generate `sampling` rows with `factory.build_batch` and persist them
+        with `bulk_create`, `batch_size` rows per statement, inside one
+        transaction.
+
+        SubFactory foreign keys are picked from the rows already generated
+        for the related model instead of creating a new parent per row. When
+        there are none yet, a pool of parents is generated first.
+
+        Factories with post-generation declarations or `django_get_or_create`
+        need saved instances, they fall back to the row by row path.
+        """
+        if (factory._meta.post_declarations.as_dict()
+                or getattr(factory._meta, 'django_get_or_create', None)):
+            with defer_api_keys():
+                items = [factory() for _ in range(0, sampling)]
+            self._track(items)
+            return items
+
+        batch_size = batch_size or self.batch_size
+        model = factory._meta.model
+        overrides = self._get_pool_overrides(factory)
+        using = router.db_for_write(model)
+        items = []
+
+        with transaction.atomic(using=using):
+            for start in range(0, sampling, batch_size):
+                size = min(batch_size, sampling - start)
+                chunk = factory.build_batch(size, **overrides)
+                self._bulk_create(model, chunk, using)
+                items.extend(chunk)
+
+        self._track(items)
+        return items
+
+    def _get_pool_overrides(self, factory):
+        """
+        Returns an `Iterator` over the generated parents of every SubFactory
+        declaration of the factory.
+        """
+        overrides = {}
+        for name, declaration in factory._meta.declarations.items():
+            if not isinstance(declaration, SubFactory):
+                continue
+
+            parent_factory = declaration.get_factory()
+            pool = self._get_pool(parent_factory._meta.model)
+
+            if not pool:
+                # Builds the pool of parents once, in batch as well.
+                app = parent_factory.__module__.rsplit('.factories', 1)[0]
+                model_name = parent_factory.__name__.replace('Factory', '')
+                pool = self.generate_batch(parent_factory, self.sampling_records)
+                self.data.setdefault(app, {}).setdefault(model_name, []).extend(pool)
+
+            overrides[name] = Iterator(pool)
+
+        return overrides
+
+    def _get_pool(self, model):
+        pool = list(self._pools.get(model._meta.label, []))
+        for data_models in self.data.values():
+            for items in data_models.values():
+                if items and type(items[0]) is model:
+                    pool.extend(items)
+
+        return pool
+
+    def _bulk_create(self, model, items, using):
+        bulk_create_with_pks(model._default_manager.db_manager(using), items)
+
+    def _track(self, items):
+        for item in items:
+            self.generated_ids.setdefault(item._meta.label, IdRanges()).add(item.pk)
+
+    def _load_pools(self, factory, generated_ids):
+        """
+        Loads the generated parents of the SubFactory declarations of the
+        factory, e.g. when they were generated by another process.
+        """
+        for declaration in factory._meta.declarations.values():
+            if not isinstance(declaration, SubFactory):
+                continue
+
+            model = declaration.get_factory()._meta.model
+            ids = generated_ids.get(model._meta.label)
+            if not ids:
+                continue
+
+            pool = []
+            manager = model._base_manager
+            for lookup in ids.lookups(self.batch_size):
+                pool.extend(manager.filter(**lookup).order_by('pk'))
+
+            self._pools[model._meta.label] = pool
+
+    def clean_up(self, chunk_size=None):
+        """
+        Clean all generated data, children before their parents, deleting
+        at most `chunk_size` ids per statement. Models without cascades nor
+        delete signals are deleted without loading their rows.
+
+        Returns the number of deleted rows per model label.
+        """
+        chunk_size = chunk_size or self.batch_size
+        models = [django_apps.get_model(label) for label in self.generated_ids]
+        deleted = {}
+
+        for level in reversed(get_dependency_levels(models)):
+            for model in level:
+                label = model._meta.label
+                ids = self.generated_ids[label]
+                deleted[label] = self._delete(model, ids, chunk_size)
+
+                log.info('Deleted %s %s rows', deleted[label], label)
+
+        self.data = {}
+        self.generated_ids = {}
+        self._pools = {}
+
+        return deleted
+
+    def _delete(self, model, ids, chunk_size):
+        using = router.db_for_write(model)
+        manager = model._base_manager.db_manager(using)
+        label = model._meta.label
+        count = 0
+
+        for lookup in ids.lookups(chunk_size):
+            queryset = manager.filter(**lookup)
+
+            if Collector(using=using).can_fast_delete(queryset):
+                count += queryset._raw_delete(using)
+            else:
+                _, rows = queryset.delete()
+                count += rows.get(label, 0)
+
+        return count
+
+    # --------------------------------------------------------------------------
+    # Snapshots
+    # --------------------------------------------------------------------------
+    def generate_from_snapshot(self, path=None):
+        """
+        Restore the snapshot of the current factories if there is one,
+        otherwise generate all data in batch mode and dump it. Returns True
+        when the data was restored from a snapshot.
+        """
+        path = path or self.get_snapshot_path()
+        if self.load_snapshot(path):
+            return True
+
+        self.generate_all(batch=True)
+        self.dump_snapshot(path)
+        return False
+
+    def get_snapshot_key(self):
+        """
+        Returns the hash of the factory modules, the columns of their models
+        and `SAMPLING_RECORDS`. A snapshot is only restored when its key
+        matches.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(self.sampling_records).encode('utf-8'))
+
+        for app, factory_apps in self.factories.items():
+            modules = []
+            for factory_app in factory_apps:
+                module = inspect.getmodule(factory_app)
+                if module not in modules:
+                    modules.append(module)
+
+                model = factory_app._meta.model
+                columns = [
+                    (field.attname, field.get_internal_type())
+                    for field in model._meta.concrete_fields
+                ]
+                digest.update(json.dumps([app, model._meta.label, columns]).encode('utf-8'))
+
+            for module in modules:
+                digest.update(inspect.getsource(module).encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def get_snapshot_path(self):
+        directory = getattr(
+            settings,
+            'SAMPLING_SNAPSHOT_DIR',
+            os.path.join(tempfile.gettempdir(), 'drf_core_snapshots')
+        )
+        return os.path.join(directory, f'{self.get_snapshot_key()}.jsonl.gz')
+
+    def dump_snapshot(self, path=None):
+        """
+        Dump the generated rows to a gzip compressed JSON lines file: a
+        header line, then for every chunk of a table a line with its columns
+        & its number of rows, followed by one line per row. Tables are
+        written parents first.
+        """
+        path = path or self.get_snapshot_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        models = [django_apps.get_model(label) for label in self.generated_ids]
+
+        with gzip.open(path, 'wt', encoding='utf-8') as snapshot:
+            self._write_line(snapshot, {'key': self.get_snapshot_key()})
+
+            for level in get_dependency_levels(models):
+                for model in level:
+                    ids = self.generated_ids[model._meta.label]
+                    attnames = [field.attname for field in model._meta.concrete_fields]
+
+                    manager = model._base_manager
+                    for lookup in ids.lookups(self.batch_size):
+                        # Counts the rows written, generated rows may have
+                        # been deleted since.
+                        rows = list(
+                            manager.filter(**lookup).order_by('pk').values_list(*attnames)
+                        )
+                        if not rows:
+                            continue
+
+                        self._write_line(snapshot, {
+                            'model': model._meta.label,
+                            'fields': attnames,
+                            'rows': len(rows),
+                        })
+                        for row in rows:
+                            self._write_line(snapshot, [
+                                to_json_value(value) for value in row
+                            ])
+
+        return path
+
+    def load_snapshot(self, path=None):
+        """
+        Restore a snapshot with `bulk_create`, in one transaction. Returns
+        False when there is no snapshot, when it was built from other
+        factories or when it is corrupted.
+        """
+        path = path or self.get_snapshot_path()
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as snapshot:
+                header = json.loads(snapshot.readline())
+                if header.get('key') != self.get_snapshot_key():
+                    return False
+
+                self._restore_snapshot(snapshot)
+        except (OSError, EOFError, ValueError, LookupError) as ex:
+            # Nothing was restored, the transaction was rolled back.
+            log.warning('Ignored the corrupted snapshot %s: %s', path, ex)
+            return False
+
+        return True
+
+    def _restore_snapshot(self, snapshot):
+        restored = []
+        restored_items = []
+        using = DEFAULT_DB_ALIAS
+
+        with transaction.atomic(using=using):
+            for line in snapshot:
+                table = json.loads(line)
+                model = django_apps.get_model(table['model'])
+                rows = (self._read_row(snapshot) for _ in range(table['rows']))
+
+                items = self._restore_table(model, table['fields'], rows, using)
+                restored_items.append((model, items))
+                if model not in restored:
+                    restored.append(model)
+
+            # Moves the sequences past the restored ids (PostgreSQL).
+            connection = connections[using]
+            statements = connection.ops.sequence_reset_sql(no_style(), restored)
+            if statements:
+                with connection.cursor() as cursor:
+                    for statement in statements:
+                        cursor.execute(statement)
+
+        # Only the committed rows are kept, a failed restore leaves no trace.
+        for model, items in restored_items:
+            app = model.__module__.rsplit('.models', 1)[0]
+            self.data.setdefault(app, {}).setdefault(model.__name__, []).extend(items)
+            self._track(items)
+
+    def _read_row(self, snapshot):
+        row = json.loads(snapshot.readline() or 'null')
+        if not isinstance(row, list):
+            raise ValueError('Truncated table')
+
+        return row
+
+    def _restore_table(self, model, attnames, rows, using):
+        fields = [model._meta.get_field(attname) for attname in attnames]
+        items = []
+        manager = model._default_manager.db_manager(using)
 
-                    for item in items:
-                        ids.append(item.id)
+        # Snapshots keep their timestamps, `auto_now` & `auto_now_add` must
+        # not overwrite them while restoring.
+        timestamps = [
+            (field, field.auto_now, field.auto_now_add)
+            for field in fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        for field, _, _ in timestamps:
+            field.auto_now = field.auto_now_add = False
 
-                    model.objects.filter(id__in=ids).delete()
-                except:
-                    for item in items:
-                        item.delete()
+        try:
+            chunk = []
+            for row in rows:
+                chunk.append(model(**{
+                    field.attname: _decode_value(field, value)
+                    for field, value in zip(fields, row)
+                }))
+
+                if len(chunk) >= self.batch_size:
+                    manager.bulk_create(chunk)
+                    items.extend(chunk)
+                    chunk = []
+
+            if chunk:
+                manager.bulk_create(chunk)
+                items.extend(chunk)
+        finally:
+            for field, auto_now, auto_now_add in timestamps:
+                field.auto_now = auto_now
+                field.auto_now_add = auto_now_add
+
+        return items
+
+    def _write_line(self, snapshot, data):
+        snapshot.write(json.dumps(data, separators=(',', ':')))
+        snapshot.write('\n')
 
     def _import_factory_by_model(self, app_name, model_name):
         return locate(f'{app_name}.factories.{model_name}Factory')
@@ -95,3 +564,126 @@ class Sampling(object):
                 pass
 
         return self.factories
+
+
+class IdRanges:
+    """
+    A compact set of generated ids. Integer ids are stored as runs of
+    consecutive values, which is what auto-increment keys produce, other
+    ids are stored as is.
+    """
+
+    def __init__(self, ids=()):
+        self.ranges = []
+        self.others = []
+
+        for pk in ids:
+            self.add(pk)
+
+    def add(self, pk):
+        if isinstance(pk, int) and not isinstance(pk, bool):
+            if self.ranges and self.ranges[-1][1] + 1 == pk:
+                self.ranges[-1][1] = pk
+            else:
+                self.ranges.append([pk, pk])
+        else:
+            self.others.append(pk)
+
+    def update(self, other):
+        for first, last in other.ranges:
+            if self.ranges and self.ranges[-1][1] + 1 == first:
+                self.ranges[-1][1] = last
+            else:
+                self.ranges.append([first, last])
+
+        self.others.extend(other.others)
+
+    def lookups(self, size):
+        """
+        Yields the filter lookups matching the ids, at most `size` ids per
+        lookup. Runs become `pk` range lookups, so that no lookup ever
+        carries a large `IN` list.
+        """
+        for first, last in self.ranges:
+            for start in range(first, last + 1, size):
+                yield {'pk__gte': start, 'pk__lte': min(start + size - 1, last)}
+
+        for start in range(0, len(self.others), size):
+            yield {'pk__in': self.others[start:start + size]}
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in self.ranges) + len(self.others)
+
+    def __iter__(self):
+        for first, last in self.ranges:
+            yield from range(first, last + 1)
+
+        yield from self.others
+
+
+def _decode_value(field, value):
+    if value is None:
+        return None
+    if field.get_internal_type() == 'BinaryField':
+        return base64.b64decode(value)
+
+    return field.to_python(value)
+
+
+def get_dependency_levels(models):
+    """
+    Groups the models by dependency level: the models of a level only
+    depend, through their foreign keys, on the models of previous levels.
+    """
+    models = list(dict.fromkeys(models))
+    dependencies = {
+        model: {
+            field.related_model
+            for field in model._meta.concrete_fields
+            if field.is_relation
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+
+    levels = []
+    done = set()
+    while len(done) < len(models):
+        level = [
+            model for model in models
+            if model not in done and dependencies[model] <= done
+        ]
+        if not level:
+            # Circular dependencies, the remaining models go last.
+            level = [model for model in models if model not in done]
+
+        levels.append(level)
+        done.update(level)
+
+    return levels
+
+
+def _init_worker():
+    import django
+
+    # Spawned workers start from a fresh interpreter.
+    if not django_apps.ready:
+        django.setup()
+
+
+def _generate_worker(factory_path, sampling, batch_size, seed, generated_ids):
+    """
+    Generate the rows of a single factory in a worker process. Returns the
+    ids of the generated rows, including their parent pools, and the
+    elapsed time.
+    """
+    reseed_random(seed)
+    started = time.perf_counter()
+
+    factory = locate(factory_path)
+    sampling_obj = Sampling()
+    sampling_obj._load_pools(factory, generated_ids)
+    sampling_obj.generate_batch(factory, sampling, batch_size)
+
+    return sampling_obj.generated_ids, time.perf_counter() - started
@@ -0,0 +1,306 @@
+""" Provides the serialization helpers of drf-core.
+
+    The fast read-only path: a serializer is compiled into a `.values()`
+    projection and a function turning each row into the representation of
+    the serializer, so that no model instance is built. The representation
+    of every value is still computed by the field of the serializer, which
+    keeps the output identical to the normal path.
+
+    The bulk write path: `BulkListSerializer` saves lists of objects with
+    `bulk_create` & `bulk_update`.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from django.utils import timezone
+from django_extensions.db.fields import ModificationDateTimeField
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.permissions import BasePermission
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField, RelatedField
+
+from drf_core.models import bulk_create_with_pks
+
+
+class CompiledSerializer:
+    """
+    The compiled form of a serializer: `lookups` is the projection to pass to
+    `.values()`, `to_representation` turns one of its rows into data.
+    """
+
+    def __init__(self, lookups, to_representation):
+        self.lookups = tuple(lookups)
+        self.to_representation = to_representation
+
+    def get_queryset(self, queryset):
+        """
+        Returns the projection of the queryset. Joins come from the lookups,
+        the planned `select_related` & `prefetch_related` are dropped.
+
+        The ordering columns & the primary key are projected too, for the
+        paginators reading them from the rows.
+        """
+        lookups = list(self.lookups)
+        for lookup in ['pk'] + _get_ordering_lookups(queryset):
+            if lookup not in lookups:
+                lookups.append(lookup)
+
+        return queryset.select_related(None).prefetch_related(None).values(*lookups)
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+# The serializers already compiled, None for the ones that cannot be.
+_compiled_serializers = {}
+
+
+def get_compiled_serializer(serializer_class):
+    """
+    Returns the `CompiledSerializer` of the serializer class, or None when
+    some of its fields need model instances, e.g. method fields, to-many
+    relations or custom `to_representation`.
+    """
+    if serializer_class not in _compiled_serializers:
+        _compiled_serializers[serializer_class] = compile_serializer(serializer_class)
+
+    return _compiled_serializers[serializer_class]
+
+
+def compile_serializer(serializer_class):
+    try:
+        serializer = serializer_class(context={})
+        model = serializer.Meta.model
+    except Exception:
+        return None
+
+    lookups = []
+    try:
+        to_representation = _compile(serializer, model, '', lookups)
+    except _NotCompilable:
+        return None
+
+    return CompiledSerializer(lookups, to_representation)
+
+
+def has_object_permissions(view):
+    """
+    Returns whether a permission of the view checks objects, which the fast
+    path cannot do without an instance.
+    """
+    return any(
+        type(permission).has_object_permission is not BasePermission.has_object_permission
+        for permission in view.get_permissions()
+    )
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Creates a list of objects with a single `bulk_create`, and updates a list
+    of objects with a single `bulk_update`. `save()` must run in a
+    transaction, the many-to-many values are set object by object.
+
+    When updating, `instance` is the list of objects in the order of the
+    data, every item of the data carrying the `id` of its object.
+    """
+    batch_size = None
+
+    def run_child_validation(self, data):
+        # Validates each item against its own object, e.g. for unique fields.
+        if self.instance is not None:
+            self.child.instance = self._get_instances_by_pk().get(
+                str(data.get('id')) if isinstance(data, dict) else None
+            )
+            self.child.initial_data = data
+
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        instances = []
+        many_to_many = []
+        for attrs in validated_data:
+            attrs, relations = self._split_many_to_many(model, attrs)
+            instances.append(model(**attrs))
+            many_to_many.append(relations)
+
+        bulk_create_with_pks(model._default_manager, instances, batch_size=self.batch_size)
+        self._set_many_to_many(instances, many_to_many)
+
+        return instances
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        update_fields = set()
+        many_to_many = []
+        for instance, attrs in zip(instances, validated_data):
+            attrs, relations = self._split_many_to_many(model, attrs)
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+                update_fields.add(model._meta.get_field(attr).name)
+            many_to_many.append(relations)
+
+        if update_fields:
+            update_fields.update(_touch_auto_now(model, instances))
+            model._default_manager.bulk_update(
+                instances, sorted(update_fields), batch_size=self.batch_size
+            )
+        self._set_many_to_many(instances, many_to_many)
+
+        return instances
+
+    def _get_instances_by_pk(self):
+        if not hasattr(self, '_instances_by_pk'):
+            self._instances_by_pk = {
+                str(instance.pk): instance for instance in self.instance
+            }
+
+        return self._instances_by_pk
+
+    def _split_many_to_many(self, model, attrs):
+        relations = {}
+        for name in list(attrs):
+            if model._meta.get_field(name).many_to_many:
+                relations[name] = attrs.pop(name)
+
+        return attrs, relations
+
+    def _set_many_to_many(self, instances, many_to_many):
+        for instance, relations in zip(instances, many_to_many):
+            for name, value in relations.items():
+                getattr(instance, name).set(value)
+
+
+def _touch_auto_now(model, instances):
+    """
+    Sets the `auto_now` fields, which `bulk_update` leaves untouched, and
+    returns their names.
+    """
+    names = []
+    now = timezone.now()
+    for field in model._meta.concrete_fields:
+        if isinstance(field, ModificationDateTimeField) or getattr(field, 'auto_now', False):
+            for instance in instances:
+                setattr(instance, field.attname, now)
+            names.append(field.name)
+
+    return names
+
+
+class _NotCompilable(Exception):
+    pass
+
+
+def _compile(serializer, model, prefix, lookups):
+    if (not isinstance(serializer, serializers.Serializer)
+            or isinstance(serializer, serializers.ListSerializer)
+            or type(serializer).to_representation is not serializers.Serializer.to_representation):
+        raise _NotCompilable()
+
+    getters = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        getters.append((field.field_name, _compile_field(field, model, prefix, lookups)))
+
+    def to_representation(row):
+        return {name: getter(row) for name, getter in getters}
+
+    return to_representation
+
+
+def _compile_field(field, model, prefix, lookups):
+    if field.source == '*':
+        raise _NotCompilable()
+
+    # Walks the source through to-one relations, which must not be null as
+    # DRF would fail on them rather than return None.
+    source_attrs = field.source.split('.')
+    path = prefix
+    for attr in source_attrs[:-1]:
+        model_field = _get_model_field(model, attr)
+        if not (model_field.many_to_one or model_field.one_to_one) or model_field.null:
+            raise _NotCompilable()
+        path += attr + '__'
+        model = model_field.related_model
+
+    model_field = _get_model_field(model, source_attrs[-1])
+    path += source_attrs[-1]
+
+    if isinstance(field, serializers.BaseSerializer):
+        if not (model_field.many_to_one or model_field.one_to_one):
+            raise _NotCompilable()
+
+        null_key = path + '__pk'
+        lookups.append(null_key)
+        nested = _compile(field, model_field.related_model, path + '__', lookups)
+        return _nested_getter(null_key, nested)
+
+    if isinstance(field, RelatedField):
+        if (not isinstance(field, PrimaryKeyRelatedField)
+                or not model_field.concrete
+                or not (model_field.many_to_one or model_field.one_to_one)):
+            raise _NotCompilable()
+
+        lookups.append(path)
+        return _pk_getter(path, field.to_representation)
+
+    if (model_field.is_relation or isinstance(model_field, FileField)
+            or type(field).get_attribute is not Field.get_attribute):
+        raise _NotCompilable()
+
+    lookups.append(path)
+    return _value_getter(path, field.to_representation)
+
+
+def _get_ordering_lookups(queryset):
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    lookups = []
+    for name in ordering:
+        if not isinstance(name, str) or name == '?':
+            continue
+
+        name = name.lstrip('-')
+        lookups.append(name)
+        try:
+            model_field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+
+        # Paginators read foreign keys through their raw column.
+        if model_field.many_to_one and model_field.concrete:
+            lookups.append(model_field.attname)
+
+    return lookups
+
+
+def _get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # Properties & methods need instances.
+        raise _NotCompilable()
+
+
+def _value_getter(key, to_representation):
+    def get(row):
+        value = row[key]
+        return None if value is None else to_representation(value)
+
+    return get
+
+
+def _pk_getter(key, to_representation):
+    def get(row):
+        value = row[key]
+        return None if value is None else to_representation(PKOnlyObject(pk=value))
+
+    return get
+
+
+def _nested_getter(null_key, to_representation):
+    def get(row):
+        return None if row[null_key] is None else to_representation(row)
+
+    return get
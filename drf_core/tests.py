@@ -3,11 +3,14 @@ import logging
 import json
 
 from rest_framework.test import APITestCase, APIClient
+from django.test import SimpleTestCase
 from django.utils.encoding import force_str
+from django.utils.functional import lazy
 from django.contrib.auth.hashers import make_password
 
 from accounts.factories import UserFactory
 from drf_core import assertion
+from drf_core.enums import ChoiceEnum
 from drf_core.sampling import Sampling
 
 log = logging.getLogger('test')
@@ -608,3 +611,34 @@ class BaseTestCase(APITestCase, assertion.BaseAssertion):
     def delete_method_forbidden(self, fragment=None, **params):
         resp = self.delete_json(fragment=fragment, **params)
         self.assertHttpForbidden(resp)
+
+
+class ChoiceEnumTestCase(SimpleTestCase):
+    """
+    The test suite of `ChoiceEnum`.
+    """
+
+    def test_lazy_labels(self):
+        evaluated = []
+
+        def translate(label):
+            evaluated.append(label)
+            return label
+
+        lazy_label = lazy(translate, str)
+
+        class Color(ChoiceEnum):
+            CHOICES = [('r', lazy_label('Red')), ('g', lazy_label('Green'))]
+
+        # Lazy labels cannot be translated while the apps are loading, so
+        # defining an enumeration must not evaluate them.
+        self.assertEqual(evaluated, [])
+
+        self.assertTrue(Color.has_value('g'))
+        self.assertEqual(Color.get_value('Green'), 'g')
+        self.assertEqual(Color.get_value('Blue', 'b'), 'b')
+        self.assertEqual(str(Color.get_label('r')), 'Red')
+        self.assertEqual(
+            Color.name_value_json_bytes(),
+            b'[{"value":"r","name":"Red"},{"value":"g","name":"Green"}]'
+        )
@@ -1,3 +1,16 @@
+import base64
+import datetime
+import decimal
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.duration import duration_iso_string
+from rest_framework.exceptions import ValidationError
+
+from drf_core import log
+
 ABERRANT_PLURAL_MAP = {
     'appendix': 'appendices',
     'barracks': 'barracks',
@@ -33,9 +46,12 @@ ABERRANT_PLURAL_MAP = {
 
 VOWELS = set('aeiou')
 
+@lru_cache(maxsize=1024)
 def pluralize(singular):
     """Return plural form of given lowercase singular word (English only). Based on
     ActiveState recipe http://code.activestate.com/recipes/413172/
+
+    The results are memoized, see `pluralize.cache_info()`.
     """
     if not singular:
         return ''
@@ -67,22 +83,265 @@ def pluralize(singular):
     return plural
 
 
-def get_queryset_by_order(queryset, ordering_by):
+def pluralize_many(singulars):
+    """
+    Returns the plural forms of the given words, in order. Each distinct word
+    is pluralized once, e.g. when generating the routes at startup.
+    """
+    singulars = list(singulars)
+    plurals = {singular: pluralize(singular) for singular in set(singulars)}
+    return [plurals[singular] for singular in singulars]
+
+
+def to_json_value(value):
+    """
+    Returns a JSON value of a model field value. Keeps full precision, unlike
+    DjangoJSONEncoder, so that `field.to_python` gives the value back.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return duration_iso_string(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+
+    return value
+
+
+ORDERING_ALLOW = 'allow'
+ORDERING_DOWNGRADE = 'downgrade'
+ORDERING_REJECT = 'reject'
+
+ORDERING_POLICIES = (ORDERING_ALLOW, ORDERING_DOWNGRADE, ORDERING_REJECT)
+
+# The orderings readable from the indexes of the models already inspected.
+_index_orderings = {}
+
+# The unindexed orderings already logged as warnings. Bounded, as the terms
+# come from the requests: past the bound, everything is logged as debug.
+_logged_orderings = set()
+MAX_LOGGED_ORDERINGS = 1000
+
+
+def get_ordering_policy(view=None):
+    """
+    Returns the ordering policy of the view, defaults to the
+    `ORDERING_POLICY` setting, then to `allow`.
+    """
+    policy = getattr(view, 'ordering_policy', None)
+    if policy is None:
+        policy = getattr(settings, 'ORDERING_POLICY', ORDERING_ALLOW)
+
+    assert policy in ORDERING_POLICIES, 'Invalid ordering policy %s' % policy
+    return policy
+
+
+def _get_field_name(model, name):
+    # Resolves `pk` & attnames, e.g. `author_id`, to the field name.
+    if name == 'pk':
+        return model._meta.pk.name
+
+    try:
+        return model._meta.get_field(name).name
+    except FieldDoesNotExist:
+        return None
+
+
+def get_index_orderings(model):
+    """
+    Returns the orderings that the indexes of the model read without a sort,
+    as `(fields, unique)` pairs of `(name, descending)` sequences: the
+    primary key, `db_index` & unique fields, `Meta.indexes`,
+    `unique_together`, `index_together` & unique constraints. Partial
+    indexes count, e.g. the live indexes of `live_lookup_fields`.
+    """
+    orderings = _index_orderings.get(model)
+    if orderings is not None:
+        return orderings
+
+    opts = model._meta
+    orderings = [(((opts.pk.name, False),), True)]
+
+    for field in opts.concrete_fields:
+        if not field.primary_key and (field.db_index or field.unique):
+            orderings.append((((field.name, False),), field.unique))
+
+    indexes = [(index.fields, False) for index in opts.indexes]
+    indexes += [(fields, True) for fields in opts.unique_together]
+    indexes += [(fields, False) for fields in opts.index_together]
+    indexes += [
+        (constraint.fields, True) for constraint in opts.constraints
+        if getattr(constraint, 'fields', None)
+    ]
+
+    for fields, unique in indexes:
+        fields = tuple(
+            (_get_field_name(model, name.lstrip('-')), name.startswith('-'))
+            for name in fields
+        )
+        if fields and all(name for name, _ in fields):
+            orderings.append((fields, unique))
+
+    _index_orderings[model] = orderings
+    return orderings
+
+
+def get_indexed_fields(model):
+    """
+    Returns the names of the fields that lead an index of the model, see
+    `get_index_orderings`.
+    """
+    indexed = {'pk'}
+    for fields, _ in get_index_orderings(model):
+        indexed.add(fields[0][0])
+
+    return indexed
+
+
+def _reads_index(index_ordering, terms, pk_name):
+    fields, unique = index_ordering
+    flipped = None
+
+    for position, (name, descending) in enumerate(terms):
+        if position >= len(fields):
+            # A unique index leaves no ties, the primary key breaks them.
+            return unique or name == pk_name
+
+        index_name, index_descending = fields[position]
+        if name != index_name:
+            return position > 0 and name == pk_name
+
+        # Indexes are read forwards or backwards, the directions of every
+        # key must be flipped or kept alike.
+        if flipped is None:
+            flipped = descending != index_descending
+        elif flipped != (descending != index_descending):
+            return False
+
+    return True
+
+
+def is_indexed_sort(model, terms):
+    """
+    Returns whether an index reads the rows in the order of `terms`, a
+    sequence of `(field_name, descending)` pairs, i.e. whether the terms are
+    a prefix of an index, read forwards or backwards.
+    """
+    if not terms:
+        return True
+
+    # Orderings spanning relations use the index of the related model alone.
+    if len(terms) == 1 and '__' in terms[0][0]:
+        return is_indexed_ordering(model, terms[0][0])
+
+    names = [_get_field_name(model, name) for name, _ in terms]
+    if not all(names):
+        return False
+
+    terms = [(name, descending) for name, (_, descending) in zip(names, terms)]
+    pk_name = model._meta.pk.name
+
+    return any(
+        _reads_index(index_ordering, terms, pk_name)
+        for index_ordering in get_index_orderings(model)
+    )
+
+
+def is_indexed_ordering(model, field_name):
+    """
+    Returns whether the database can read `field_name` (possibly spanning
+    relations) in order from an index. Unknown fields are not indexed.
+    """
+    parts = field_name.split('__')
+
+    for part in parts[:-1]:
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return False
+        if not field.is_relation or field.related_model is None:
+            return False
+        model = field.related_model
+
+    try:
+        field = model._meta.get_field(parts[-1])
+    except FieldDoesNotExist:
+        return parts[-1] == 'pk'
+
+    return field.name in get_indexed_fields(model)
+
+
+def get_queryset_by_order(queryset, ordering_by, policy=ORDERING_ALLOW):
     """
     Return queryset with the ordered data
     :param queryset: queryset
-    :param ordering_by: order by single feature
+    :param ordering_by: comma separated features (or a list of them), a
+        leading `-` orders descending
+    :param policy: what to do with orderings that no index supports:
+        `allow` them, `downgrade` them by dropping the unindexed features,
+        or `reject` them with a validation error
     :return:
     """
-    # Return queryset with ordering
-    if ordering_by:
-        is_asc = ordering_by[0].isalpha()
-        ordering_by = ordering_by if is_asc else ordering_by[1:]
+    # Return queryset without ordering
+    if not ordering_by:
+        return queryset
 
-        if is_asc:
-            return queryset.order_by(f'{ordering_by}')
+    if isinstance(ordering_by, str):
+        ordering_by = ordering_by.split(',')
 
-        return queryset.order_by(f'-{ordering_by}')
+    model = queryset.model
+    ordering = []
+    indexed = []
+    unindexed = []
 
-    # Return queryset without ordering
-    return queryset
\ No newline at end of file
+    for term in ordering_by:
+        term = term.strip()
+        field_name = term.lstrip('-+')
+        if not field_name:
+            continue
+
+        is_asc = not term.startswith('-')
+
+        # The terms are checked together, a multi-key ordering needs an
+        # index on all of its keys, in order.
+        if is_indexed_sort(model, indexed + [(field_name, not is_asc)]):
+            indexed.append((field_name, not is_asc))
+        else:
+            unindexed.append(field_name)
+            if policy == ORDERING_DOWNGRADE:
+                continue
+
+        ordering.append(field_name if is_asc else f'-{field_name}')
+
+    if unindexed:
+        if policy == ORDERING_REJECT:
+            raise ValidationError({
+                'ordering': ['Ordering by {} is not supported.'.format(
+                    ', '.join(unindexed)
+                )]
+            })
+
+        # Warns once per model & ordering, the repeats are logged as debug.
+        key = (model._meta.label, tuple(unindexed), policy)
+        logged = key in _logged_orderings or len(_logged_orderings) >= MAX_LOGGED_ORDERINGS
+        if not logged:
+            _logged_orderings.add(key)
+
+        (log.debug if logged else log.warning)(
+            'Unindexed ordering on %s by %s (%s)',
+            model._meta.label, ', '.join(unindexed),
+            'downgraded' if policy == ORDERING_DOWNGRADE else 'allowed'
+        )
+
+    if not ordering:
+        return queryset
+
+    # A unique tiebreaker keeps the ordering stable across pages.
+    opts = model._meta
+    pk_names = {'pk', opts.pk.name, opts.pk.attname}
+    if not any(term.lstrip('-') in pk_names for term in ordering):
+        ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+
+    return queryset.order_by(*ordering)